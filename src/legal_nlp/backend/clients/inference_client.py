@@ -1,67 +1,147 @@
 import json
-import websockets
-import requests
+import httpx
 import time
+from websockets.exceptions import ConnectionClosed
 from config import Config
+from utils.metrics import Histogram
+from utils.websocket_pool import WebsocketPool
+
+TIME_TO_FIRST_TOKEN_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30]
+TOKENS_PER_SECOND_BUCKETS = [1, 5, 10, 20, 40, 60, 80, 100, 150, 200]
+
+
+def build_request_data(messages, generation_args={}, prompt=None):
+    return {
+        "messages": messages,
+        "seed": generation_args.get('seed', 10),
+        "max_tokens": generation_args.get('max_tokens', 512),
+        "temperature": generation_args.get('temperature', 0.8),
+        "top_p": generation_args.get('top_p', 0.7),
+        "repetition_penalty": generation_args.get('repetition_penalty', 1.05),
+        "top_k": generation_args.get('top_k', 30),
+        "add_bos_token": generation_args.get('add_bos_token', False),
+        "use_lora": generation_args.get('use_lora', False),
+        "prompt": prompt
+    }
+
+
+class AsyncInferenceClient:
+    """
+    asyncio client for the inference server. Chat requests share one pooled keep-alive httpx client, streams reuse
+    websocket connections from a WebsocketPool. Time to first token and tokens per second (each text_stream event
+    is one token) are recorded for every stream that runs to the end.
+    """
 
-class InferenceClient:
     def __init__(self):
         self.chat_uri = Config.INFERENCE_CHAT_URI + "/api/v1/chat"
         self.stream_uri = Config.INFERENCE_STREAM_URI + "/api/v2/stream"
+        self.client = None
+        self.websockets = WebsocketPool(
+            self.stream_uri,
+            max_connections=Config.INFERENCE_WS_MAX_CONNECTIONS,
+            max_idle=Config.INFERENCE_WS_MAX_IDLE,
+            ping_interval=Config.INFERENCE_WS_PING_INTERVAL,
+            ping_timeout=Config.INFERENCE_WS_PING_TIMEOUT,
+            idle_timeout=Config.INFERENCE_WS_IDLE_TIMEOUT,
+        )
+        self.requests = 0
+        self.streams = 0
+        self.abandoned = 0
+        self.stale_retries = 0
+        self.time_to_first_token = Histogram(TIME_TO_FIRST_TOKEN_BUCKETS)
+        self.tokens_per_second = Histogram(TOKENS_PER_SECOND_BUCKETS)
 
+    def get_client(self):
+        # Created on first use so it belongs to the running event loop
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                headers={"Content-Type": "application/json"},
+                timeout=httpx.Timeout(Config.LLM_READ_TIMEOUT, connect=Config.LLM_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=Config.LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=Config.LLM_MAX_CONNECTIONS,
+                ),
+            )
+        return self.client
 
-    def queue_async_job(self, messages, stream=False,  generation_args={}, prompt=None):
+    async def queue_async_job(self, messages, stream=False, generation_args={}, prompt=None):
         if stream:
-            yield from self.get_gpt_stream(messages, generation_args=generation_args, prompt=prompt)
+            async for text in self.get_gpt_stream(messages, generation_args=generation_args, prompt=prompt):
+                yield text
         else:
-            return self.get_gpt_response(messages, generation_args=generation_args, prompt=prompt)
-
-
-    def get_gpt_stream(self, messages, generation_args={}, prompt=None):
-        data = {
-            "messages": messages,
-            "seed": generation_args.get('seed', 10),
-            "max_tokens": generation_args.get('max_tokens', 512),
-            "temperature": generation_args.get('temperature', 0.8),
-            "top_p": generation_args.get('top_p', 0.7),
-            "repetition_penalty": generation_args.get('repetition_penalty', 1.05),
-            "top_k": generation_args.get('top_k', 30),
-            "add_bos_token": generation_args.get('add_bos_token', False),
-            "use_lora": generation_args.get('use_lora', False),
-            "prompt": prompt
-        }
-        
-        with websockets.connect(self.stream_uri, ping_interval=None) as websocket:
-            websocket.send(json.dumps(data))
+            yield await self.get_gpt_response(messages, generation_args=generation_args, prompt=prompt)
 
-            while True:
-                incoming_data = websocket.recv()
-                incoming_data = json.loads(incoming_data)
+    async def get_gpt_stream(self, messages, generation_args={}, prompt=None):
+        data = build_request_data(messages, generation_args, prompt)
+        self.streams += 1
 
-                match incoming_data["event"]:
-                    case "text_stream":
-                        yield incoming_data["text"]
-                    case "stream_end":
-                        return
+        fresh = False
+        finished = False
+        while not finished:
+            websocket, reused = await self.websockets.acquire(fresh=fresh)
+            stale = False
+            tokens = 0
+            first_token = None
+            try:
+                start = time.monotonic()
+                await websocket.send(json.dumps(data))
 
+                while True:
+                    incoming_data = json.loads(await websocket.recv())
 
-    def get_gpt_response(self, messages, generation_args={}, prompt=None):
-        headers = {
-            "Content-Type": "application/json"
-        }
+                    match incoming_data["event"]:
+                        case "text_stream":
+                            if first_token is None:
+                                first_token = time.monotonic()
+                            tokens += 1
+                            yield incoming_data["text"]
+                        case "stream_end":
+                            finished = True
+                            break
+            except ConnectionClosed:
+                # The server closed an idle connection that still looked open. Nothing was yielded yet, so run the
+                # stream again once on a new connection.
+                if not reused or fresh or first_token is not None:
+                    raise
+                stale = True
+                fresh = True
+                self.stale_retries += 1
+            finally:
+                # A stream abandoned part way leaves the rest of its output on the connection, so it isn't reused.
+                # Closing the connection also stops the server generating the rest.
+                if not finished and not stale:
+                    self.abandoned += 1
+                await self.websockets.release(websocket, reusable=finished)
+
+        if first_token is not None:
+            time_to_first_token = first_token - start
+            tokens_per_second = tokens / max(time.monotonic() - first_token, 1e-6)
+            self.time_to_first_token.observe(time_to_first_token)
+            self.tokens_per_second.observe(tokens_per_second)
+            print(f"Streamed {tokens} tokens, first after {time_to_first_token:.2f}s, {tokens_per_second:.1f} tokens/s")
+
+    async def get_gpt_response(self, messages, generation_args={}, prompt=None):
+        data = build_request_data(messages, generation_args, prompt)
+        self.requests += 1
+        response = await self.get_client().post(self.chat_uri, json=data)
+        response.raise_for_status()
 
-        data = {
-            "messages": messages,
-            "seed": generation_args.get('seed', 10),
-            "max_tokens": generation_args.get('max_tokens', 512),
-            "temperature": generation_args.get('temperature', 0.8),
-            "top_p": generation_args.get('top_p', 0.7),
-            "repetition_penalty": generation_args.get('repetition_penalty', 1.05),
-            "top_k": generation_args.get('top_k', 30),
-            "add_bos_token": generation_args.get('add_bos_token', False),
-            "use_lora": generation_args.get('use_lora', False),
-            "prompt": prompt
-        }
-        response = requests.post(self.chat_uri, headers=headers, json=data, verify=True)
-        
         return response.json()['response']
+
+    def stats(self):
+        return {
+            "client": "inference",
+            "requests": self.requests,
+            "streams": self.streams,
+            "abandoned": self.abandoned,
+            "stale_retries": self.stale_retries,
+            "time_to_first_token_seconds": self.time_to_first_token.snapshot(),
+            "tokens_per_second": self.tokens_per_second.snapshot(),
+            "websockets": self.websockets.stats(),
+        }
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+        await self.websockets.close()
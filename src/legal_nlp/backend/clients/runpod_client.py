@@ -1,77 +1,188 @@
-import requests
-import time
+import asyncio
+import httpx
+import json
+import random
 from config import Config
+from utils.metrics import Histogram
+
+RUNNING_STATUSES = ("IN_QUEUE", "IN_PROGRESS")
+
+
+def build_job_input(messages, generation_args={}, prompt=None):
+    return {
+        "messages": messages,
+        "seed": generation_args.get('seed', 10),
+        "max_tokens": generation_args.get('max_tokens', 512),
+        "temperature": generation_args.get('temperature', 0.8),
+        "top_p": generation_args.get('top_p', 0.7),
+        "repetition_penalty": generation_args.get('repetition_penalty', 1.05),
+        "top_k": generation_args.get('top_k', 30),
+        "add_bos_token": generation_args.get('add_bos_token', False),
+        "use_lora": generation_args.get('use_lora', False),
+        "prompt": prompt
+    }
+
+
+class PollBackoff:
+    """
+    Delay between polls of a Runpod job. Grows by factor after every poll that finds nothing new, up to max_delay,
+    and is jittered so concurrent jobs don't poll in lockstep. reset() drops back to min_delay once there is output.
+    """
+
+    def __init__(self, min_delay: float, max_delay: float, factor: float = 1.5, jitter: float = 0.2):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.factor = factor
+        self.jitter = jitter
+        self.delay = min_delay
+
+    def reset(self):
+        self.delay = self.min_delay
+
+    def next(self):
+        delay = self.delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+        self.delay = min(max(self.delay, 0.05) * self.factor, self.max_delay)
+        return delay
+
+
+def use_runsync(messages, prompt):
+    """
+    Short prompts are sent to /runsync, which usually returns the finished job in the same request
+    """
+    prompt_chars = len(prompt) if prompt is not None else len(json.dumps(messages))
+    return prompt_chars <= Config.RUNPOD_RUNSYNC_MAX_PROMPT_CHARS
+
+
+def stream_delta(stream_json):
+    # /stream only returns the output produced since the previous call, along with the job status
+    return "".join(x["output"] for x in stream_json.get("stream", []))
+
+
+class RunpodJobError(Exception):
+    pass
+
+
+class AsyncRunpodClient:
+    """
+    asyncio client for Runpod serverless jobs. Requests share one pooled keep-alive httpx client so status polls
+    don't pay for a new TCP+TLS handshake, and waiting on a job doesn't block the event loop.
+    """
 
-class RunpodClient:
     def __init__(self):
         self.base_uri = Config.RUNPOD_BASE_URI
         self.bearer_token = Config.RUNPOD_BEARER_TOKEN
-        self.status_check_delay = Config.RUNPOD_STATUS_CHECK_DELAY
-        self.stream_delay = Config.RUNPOD_STREAM_DELAY
-
-    def get_stream_output(self, stream_endpoint, headers):
-        stream_response = requests.get(stream_endpoint, headers=headers)
-        stream_json = stream_response.json()
-        output = [x["output"] for x in stream_json["stream"]]
-        return output
-
-    def queue_async_job(self, messages, stream=False,  generation_args={}, prompt=None):
-        endpoint = f"{self.base_uri}/run"
-        
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.bearer_token}",
-        }
+        self.status_check_delay = float(Config.RUNPOD_STATUS_CHECK_DELAY)
+        self.stream_delay = float(Config.RUNPOD_STREAM_DELAY)
+        self.max_poll_delay = float(Config.RUNPOD_MAX_POLL_DELAY)
+        self.client = None
 
-        data = {
-            "input": {
-                "messages": messages,
-                "seed": generation_args.get('seed', 10),
-                "max_tokens": generation_args.get('max_tokens', 512),
-                "temperature": generation_args.get('temperature', 0.8),
-                "top_p": generation_args.get('top_p', 0.7),
-                "repetition_penalty": generation_args.get('repetition_penalty', 1.05),
-                "top_k": generation_args.get('top_k', 30),
-                "add_bos_token": generation_args.get('add_bos_token', False),
-                "use_lora": generation_args.get('use_lora', False),
-                "prompt": prompt
-            }
-        }
+        self.jobs = 0
+        self.runsync_completed = 0
+        self.cancelled = 0
+        self.requests_per_job = Histogram([1, 2, 3, 5, 10, 20, 50, 100, 200])
+        self.bytes_per_job = Histogram([1e3, 1e4, 1e5, 1e6, 1e7])
 
-        # Queue up job
-        response = requests.post(endpoint, headers=headers, json=data, verify=True)
+    def get_client(self):
+        # Created on first use so it belongs to the running event loop
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                headers={
+                    "Content-Type": "application/json",
+                    "Authorization": f"Bearer {self.bearer_token}",
+                },
+                timeout=httpx.Timeout(Config.LLM_READ_TIMEOUT, connect=Config.LLM_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=Config.LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=Config.LLM_MAX_CONNECTIONS,
+                ),
+            )
+        return self.client
+
+    async def request(self, method, url, job_stats, **kwargs):
+        response = await self.get_client().request(method, url, **kwargs)
         response.raise_for_status()
-        
-        jobId = response.json()['id']
+        job_stats["requests"] += 1
+        job_stats["bytes"] += len(response.request.content) + len(response.content)
+        return response.json()
+
+    async def queue_async_job(self, messages, stream=False, generation_args={}, prompt=None):
+        data = {"input": build_job_input(messages, generation_args, prompt)}
+        job_stats = {"requests": 0, "bytes": 0}
+
+        # Queue up job
+        if not stream and use_runsync(messages, prompt):
+            status = await self.request("POST", f"{self.base_uri}/runsync", job_stats, json=data)
+            if status.get("status") == "COMPLETED":
+                self.runsync_completed += 1
+        else:
+            status = await self.request("POST", f"{self.base_uri}/run", job_stats, json=data)
+
+        jobId = status['id']
         status_endpoint = f"{self.base_uri}/status/{jobId}"
         stream_endpoint = f"{self.base_uri}/stream/{jobId}"
-        
-        status = {'id': jobId, 'status': "IN_QUEUE"}
-        
-        # Wait for job to finish
-        while (status['status'] == "IN_QUEUE" or status['status'] == "IN_PROGRESS"):
-            # Query job status
-            status_response = requests.get(status_endpoint, headers=headers)
-            status_response.raise_for_status()
-            status = status_response.json()
-            
+
+        try:
+            # Wait for job to finish
             if stream:
-                output = self.get_stream_output(stream_endpoint, headers)
-                yield "".join(output)
-                time.sleep(self.stream_delay)
+                backoff = PollBackoff(max(self.stream_delay, self.status_check_delay), self.max_poll_delay)
+                while True:
+                    status = await self.request("GET", stream_endpoint, job_stats)
+                    delta = stream_delta(status)
+                    if delta:
+                        backoff.reset()
+                        try:
+                            yield delta
+                        except GeneratorExit:
+                            if status.get("status") in RUNNING_STATUSES:
+                                # The caller has all the output it needs, stop the job rather than pay for the rest
+                                status = await self.cancel_job(jobId, job_stats)
+                            raise
+                    if status.get("status") not in RUNNING_STATUSES:
+                        break
+                    await asyncio.sleep(backoff.next())
             else:
-                time.sleep(self.status_check_delay)
+                backoff = PollBackoff(self.status_check_delay, self.max_poll_delay)
+                while status['status'] in RUNNING_STATUSES:
+                    await asyncio.sleep(backoff.next())
+                    status = await self.request("GET", status_endpoint, job_stats)
+        finally:
+            self.jobs += 1
+            self.requests_per_job.observe(job_stats["requests"])
+            self.bytes_per_job.observe(job_stats["bytes"])
+            print(f"Runpod job {jobId} {status.get('status')}: {job_stats['requests']} requests, {job_stats['bytes']} bytes")
 
-        if stream:
-            output = self.get_stream_output(stream_endpoint, headers)
-            yield "".join(output)
-        else:
+        if status.get("status") != "COMPLETED":
+            raise RunpodJobError(f"Runpod job {jobId} {status.get('status')}")
+        if not stream:
             yield status['output']['response']
 
-    def get_gpt_response(self, messages, generation_args={}, prompt=None):
+    async def cancel_job(self, job_id, job_stats):
+        try:
+            status = await self.request("POST", f"{self.base_uri}/cancel/{job_id}", job_stats)
+        except httpx.HTTPError as e:
+            print(f"Failed to cancel Runpod job {job_id}: {e}")
+            return {"status": "CANCEL_FAILED"}
+        self.cancelled += 1
+        return status
+
+    def stats(self):
+        return {
+            "client": "runpod",
+            "jobs": self.jobs,
+            "runsync_completed": self.runsync_completed,
+            "cancelled": self.cancelled,
+            "requests_per_job": self.requests_per_job.snapshot(),
+            "bytes_per_job": self.bytes_per_job.snapshot(),
+        }
+
+    async def get_gpt_response(self, messages, generation_args={}, prompt=None):
         response = ""
-        response_generator = self.queue_async_job(messages, stream=False,  generation_args=generation_args, prompt=prompt)
-        for message in response_generator:
+        async for message in self.queue_async_job(messages, stream=False, generation_args=generation_args, prompt=prompt):
             response += message
-        
-        return message
\ No newline at end of file
+
+        return response
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
@@ -13,11 +13,82 @@ class Config:
         "INFERENCE_CHAT_URI", "http://127.0.0.1:2235"
     )
     INFERENCE_STREAM_URI = os.getenv(
-        "INFERENCE_STREAM_URI", "ws:///127.0.0.1:2234"
+        "INFERENCE_STREAM_URI", "ws://127.0.0.1:2234"
     )
+    # Inference server streams share up to INFERENCE_WS_MAX_CONNECTIONS websockets, pinged every
+    # INFERENCE_WS_PING_INTERVAL seconds, and up to INFERENCE_WS_MAX_IDLE are kept open between streams
+    INFERENCE_WS_MAX_CONNECTIONS = int(os.getenv("INFERENCE_WS_MAX_CONNECTIONS", 16))
+    INFERENCE_WS_MAX_IDLE = int(os.getenv("INFERENCE_WS_MAX_IDLE", 8))
+    INFERENCE_WS_PING_INTERVAL = float(os.getenv("INFERENCE_WS_PING_INTERVAL", 20))
+    INFERENCE_WS_PING_TIMEOUT = float(os.getenv("INFERENCE_WS_PING_TIMEOUT", 20))
+    INFERENCE_WS_IDLE_TIMEOUT = float(os.getenv("INFERENCE_WS_IDLE_TIMEOUT", 300))
     STREAM_CHAT = os.getenv("STREAM_CHAT", True)
     RUNPOD_STREAM_DELAY = os.getenv("RUNPOD_STREAM_DELAY", 0.0)
     RUNPOD_STATUS_CHECK_DELAY = os.getenv("RUNPOD_STATUS_CHECK_DELAY", 0.1)
     RUNPOD_SERVERLESS=True
+    # Runpod jobs are polled with exponential backoff from RUNPOD_STATUS_CHECK_DELAY up to RUNPOD_MAX_POLL_DELAY seconds
+    RUNPOD_MAX_POLL_DELAY = float(os.getenv("RUNPOD_MAX_POLL_DELAY", 2.0))
+    # Non-streamed prompts up to this many characters go to /runsync and usually finish without polling
+    RUNPOD_RUNSYNC_MAX_PROMPT_CHARS = int(os.getenv("RUNPOD_RUNSYNC_MAX_PROMPT_CHARS", 16000))
+    # Timeouts (seconds) and connection pool size for the LLM clients
+    LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", 10))
+    LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", 120))
+    LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 100))
+    # Number of chunks sent to the LLM at once by /get_document_relations/
+    RELATION_CONCURRENCY = int(os.getenv("RELATION_CONCURRENCY", 8))
+    # Max tokens of existing relations included in each relation extraction prompt
+    RELATION_CONTEXT_TOKEN_BUDGET = int(os.getenv("RELATION_CONTEXT_TOKEN_BUDGET", 1024))
+    # Relation extraction max_tokens is estimated from the tagged entities in each chunk: RELATION_MIN_NEW_TOKENS plus
+    # RELATION_TOKENS_PER_RELATION for up to RELATION_RELATIONS_PER_ENTITY relations per entity, capped at the
+    # request's max_new_tokens
+    RELATION_ADAPTIVE_MAX_TOKENS = os.getenv("RELATION_ADAPTIVE_MAX_TOKENS", "true").lower() == "true"
+    RELATION_MIN_NEW_TOKENS = int(os.getenv("RELATION_MIN_NEW_TOKENS", 256))
+    RELATION_TOKENS_PER_RELATION = int(os.getenv("RELATION_TOKENS_PER_RELATION", 120))
+    RELATION_RELATIONS_PER_ENTITY = int(os.getenv("RELATION_RELATIONS_PER_ENTITY", 3))
+    # Stream relation extraction and cancel generation once the model has closed the JSON list
+    RELATION_EARLY_STOP = os.getenv("RELATION_EARLY_STOP", "true").lower() == "true"
+    # Model served by the LLM backend, also used for the relation prompt tokenizer. Change it when the endpoint is
+    # switched to a different model so responses cached from the old model aren't reused.
+    LLM_MODEL = os.getenv("LLM_MODEL", "mistralai/Mixtral-8x7B-Instruct-v0.1")
+    # Relation extraction is seeded so LLM responses are cached by backend, model, prompt and generation args. Set
+    # LLM_CACHE_DB_PATH to a file to keep them across restarts, by default they are only kept in memory.
+    LLM_CACHE = os.getenv("LLM_CACHE", "true").lower() == "true"
+    LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+    LLM_CACHE_DB_PATH = os.getenv("LLM_CACHE_DB_PATH", "")
+    LLM_CACHE_MAX_DISK_BYTES = int(os.getenv("LLM_CACHE_MAX_DISK_BYTES", 256 * 1024 * 1024))
+    # Background relation jobs submitted through /relation_jobs/, finished jobs are kept for RELATION_JOB_TTL seconds.
+    # The job database holds the submitted document text, keep it out of the source tree.
+    RELATION_JOB_WORKERS = int(os.getenv("RELATION_JOB_WORKERS", 2))
+    RELATION_JOB_DB_PATH = os.getenv(
+        "RELATION_JOB_DB_PATH", os.path.join(os.path.expanduser("~"), ".legal_nlp", "relation_jobs.sqlite")
+    )
+    RELATION_JOB_TTL = float(os.getenv("RELATION_JOB_TTL", 24 * 60 * 60))
+    # Relation graphs built up through /relation_graphs/ are dropped after GRAPH_SESSION_TTL seconds unused
+    GRAPH_SESSION_TTL = float(os.getenv("GRAPH_SESSION_TTL", 3600))
+    GRAPH_SESSION_MAX_BYTES = int(os.getenv("GRAPH_SESSION_MAX_BYTES", 64 * 1024 * 1024))
+    # Graphviz svg renders run in a pool of GRAPH_RENDER_WORKERS threads and are cached by relation content
+    GRAPH_RENDER_WORKERS = int(os.getenv("GRAPH_RENDER_WORKERS", 2))
+    GRAPH_SVG_CACHE_MAX_BYTES = int(os.getenv("GRAPH_SVG_CACHE_MAX_BYTES", 32 * 1024 * 1024))
     
-    NER_MODEL = "nlp/models/en_legal_ner_trf"
\ No newline at end of file
+    NER_MODEL = "nlp/models/en_legal_ner_trf"
+    # Load models in the background on startup, otherwise they are loaded by the first request that needs them
+    WARM_UP_MODELS = os.getenv("WARM_UP_MODELS", "true").lower() == "true"
+    # How long start_both.py waits for /ready before starting the frontend
+    READY_TIMEOUT = int(os.getenv("BACKEND_READY_TIMEOUT", 600))
+    NER_BATCH_SIZE = int(os.getenv("NER_BATCH_SIZE", 8))
+    NER_CACHE_MAX_BYTES = int(os.getenv("NER_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+    # Leave NER_CACHE_DB_PATH empty to keep the NER cache in memory only
+    NER_CACHE_DB_PATH = os.getenv("NER_CACHE_DB_PATH", "")
+    NER_CACHE_MAX_DISK_BYTES = int(os.getenv("NER_CACHE_MAX_DISK_BYTES", 1024 * 1024 * 1024))
+    NER_MAX_BLOCK_SIZE = int(os.getenv("NER_MAX_BLOCK_SIZE", 2000))
+    # Paragraph block entities are cached separately from whole documents, with their own size limits and stats.
+    # NER_BLOCK_CACHE_DB_PATH must not be the same file as NER_CACHE_DB_PATH.
+    NER_BLOCK_CACHE_MAX_BYTES = int(os.getenv("NER_BLOCK_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+    NER_BLOCK_CACHE_DB_PATH = os.getenv("NER_BLOCK_CACHE_DB_PATH", "")
+    NER_BLOCK_CACHE_MAX_DISK_BYTES = int(os.getenv("NER_BLOCK_CACHE_MAX_DISK_BYTES", 1024 * 1024 * 1024))
+    NER_MICRO_BATCHING = os.getenv("NER_MICRO_BATCHING", "true").lower() == "true"
+    NER_BATCH_MAX_SIZE = int(os.getenv("NER_BATCH_MAX_SIZE", 16))
+    NER_BATCH_MAX_WAIT_MS = float(os.getenv("NER_BATCH_MAX_WAIT_MS", 5))
+    # Number of forked NER worker processes, 0 runs inference in the API process. Set to the number of cores to use.
+    NER_WORKERS = int(os.getenv("NER_WORKERS", 0))
+    NER_WORKER_THREADS = int(os.getenv("NER_WORKER_THREADS", 1))
\ No newline at end of file
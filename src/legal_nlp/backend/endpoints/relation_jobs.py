@@ -0,0 +1,31 @@
+from config import Config
+from endpoints.relation_processor import relation_processor
+from utils.job_queue import JobQueue
+
+
+async def run_relation_graph(params, progress):
+    progress(0, 1)
+    result = await relation_processor.get_relation_graph(
+        params["text"], params["existing_relations"], params["max_new_tokens"], params["render_svg"]
+    )
+    progress(1, 1)
+    return result
+
+
+async def run_document_relations(params, progress):
+    return await relation_processor.get_document_relation_graph(
+        params["text"],
+        params["max_new_tokens"],
+        params["concurrency"],
+        params["min_chunk_size"],
+        params["render_svg"],
+        progress=progress,
+    )
+
+
+relation_jobs = JobQueue(
+    {"relation_graph": run_relation_graph, "document_relations": run_document_relations},
+    Config.RELATION_JOB_WORKERS,
+    Config.RELATION_JOB_DB_PATH or None,
+    Config.RELATION_JOB_TTL,
+)
@@ -1,11 +1,20 @@
+import asyncio
 import graphviz
-from clients.runpod_client import RunpodClient
-from clients.inference_client import InferenceClient
+from concurrent.futures import ThreadPoolExecutor
+from clients.runpod_client import AsyncRunpodClient
+from clients.inference_client import AsyncInferenceClient
 import json
 import re
-from transformers import AutoTokenizer
 import html
+import time
+from collections import Counter
 from config import Config
+from utils.lazy_model import LazyModel
+from utils.relation_json import RelationStreamParser, extract_relation_objects
+from utils.graph_store import GraphStore
+from utils.entity_aliases import EntityAliasIndex, rename_entities
+from utils.relation_set import RelationSet, normalize_entity_name
+from utils.result_cache import ResultCache, make_cache_key
 
 RELATION_GRAPH_PROMPT = """## Relation Extraction Instructions
 
@@ -36,8 +45,7 @@ The JSON should include the following fields:
  - Entities should be short proper nouns.
  - Entites cannot be abstract terms like Nil, None, Null, or anything of that sort.
  
-**Consistency:** When extracting entities, it's vital to ensure consistency.
- - An entity, such as "John Doe", could be referred to by different names or pronouns (e.g., "Joe", "John", "Mr. Doe", "he") between the given text and the existing relations in the graph. Always use the same identifier as already existing within the graph if the entity already exists, otherwise use the most copmlete identifier for that entity, in this using case use "John Doe".
+**Consistency:** Use the same entity names as the existing relations in the graph.
  - If a similar relation already exists try to reuse the same relation label wherever appropriate.
  
 ### JSON Output Example
@@ -73,25 +81,89 @@ Here is the text from which to extract the entity relations.
 1. Extract relations for the detected entities. 
 2. For any new entities added to the graph try to extrapolate the relations between them and the existing entities whenever possible.
 3. Create any new implicit relations based on the existing relations and info provided in the graph.
-If any of the following entities are the same as one of the existing extracted entities but under a different or similar name then use the already existing entity name in the graph. Return the solution to all tasks in a single json list."""
+Return the solution to all tasks in a single json list."""
 
+# Stands in for the per-request part of the prompt when the chat template is rendered once up front
+PROMPT_SENTINEL = "<<relation_prompt_variable_part>>"
 
-class RelationProcessor:
+
+def chunk_text(text, min_chunk_size=2000):
+    """
+    Split tagged text on sentence ends into chunks of at least min_chunk_size characters containing at least one tag
+    """
+    chunked_text = text.split(".")
+    chunks = []
+    
+    i = 0
+    while i < len(chunked_text):
+        chunk = ""
+        while len(chunk) < min_chunk_size or "</" not in chunk:
+            if i >= len(chunked_text):
+                break
+            if len(chunked_text[i]) > 0:
+                chunk += chunked_text[i] + "."
+            i += 1
+            
+        if len(chunk) > 0:
+            chunks.append(chunk)
+    
+    return chunks
+
+
+class RelationProcessor(LazyModel):
     def __init__(self):
+        super().__init__()
         if Config.RUNPOD_SERVERLESS:
-            self.gpt_client = RunpodClient()
+            self.gpt_client = AsyncRunpodClient()
+            self.llm_backend = ("runpod", Config.RUNPOD_BASE_URI, Config.LLM_MODEL)
         else:
-            self.gpt_client = InferenceClient()
-        self.tokenizer = AutoTokenizer.from_pretrained("mistralai/Mixtral-8x7B-Instruct-v0.1")
+            self.gpt_client = AsyncInferenceClient()
+            self.llm_backend = ("inference", Config.INFERENCE_CHAT_URI, Config.INFERENCE_STREAM_URI, Config.LLM_MODEL)
+        self.tokenizer = None
         self.seed = 21
+        # Chat template rendering of the static RELATION_GRAPH_PROMPT, filled in by load_model()
+        self.prompt_prefix = None
+        self.prompt_suffix = None
+        self.prefix_tokens = 0
+        self.prompt_count = 0
+        self.suffix_tokens_total = 0
+        # Token budgets and usage of relation extraction responses, see record_token_usage()
+        self.token_usage = Counter()
+        self.graph_store = GraphStore(Config.GRAPH_SESSION_TTL, Config.GRAPH_SESSION_MAX_BYTES)
+        # graphviz runs as a subprocess, so a small thread pool is enough to keep it off the event loop
+        self.render_executor = ThreadPoolExecutor(max_workers=Config.GRAPH_RENDER_WORKERS)
+        self.svg_cache = ResultCache(Config.GRAPH_SVG_CACHE_MAX_BYTES)
+        self.llm_cache = None
+        if Config.LLM_CACHE:
+            self.llm_cache = ResultCache(
+                Config.LLM_CACHE_MAX_BYTES, Config.LLM_CACHE_DB_PATH or None, Config.LLM_CACHE_MAX_DISK_BYTES
+            )
+
+    def load_model(self):
+        # Importing transformers is slow so it is only done when the tokenizer is first needed
+        from transformers import AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(Config.LLM_MODEL)
+        self.compile_prompt_prefix()
+
+    def compile_prompt_prefix(self):
+        """
+        Render the chat template once around a sentinel and split it into the part before the per-request content
+        and the part after it. Every prompt then starts with the same byte-identical prefix, which lets the
+        inference server reuse its KV cache for it, and the prefix is only tokenized once.
+        """
+        messages = [{"role": "user", "content": RELATION_GRAPH_PROMPT + PROMPT_SENTINEL}]
+        template = self.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+        if template.count(PROMPT_SENTINEL) != 1:
+            # The template altered the content, fall back to rendering the full prompt per request
+            print("Chat template can't be split, relation prompt prefix will not be precompiled")
+            return
 
-    def extract_json_from_text(self, text):
-        # Define a regular expression pattern to match each dictionary
-        pattern = r'{\s*"relation":\s*"[^"]+",\s*"entity1":\s*{[^}]+},\s*"entity2":\s*{[^}]+},\s*"additional_info":\s*{[^}]+}\s*}'
+        self.prompt_prefix, self.prompt_suffix = template.split(PROMPT_SENTINEL)
+        self.prefix_tokens = self.count_tokens(self.prompt_prefix)
 
-        # Find all matches of the pattern in the text
-        matches = re.findall(pattern, text, re.DOTALL)
-        return json.loads(f'[{",".join(matches)}]')
+    def extract_json_from_text(self, text):
+        return extract_relation_objects(text)
     
     def extract_entities_from_text(self, text):
         pattern = r'<.*?>(.*?)<\/.*?>'
@@ -120,36 +192,475 @@ class RelationProcessor:
         
         return dot
 
-    def build_up_relation_graph(
-        self, text: str, existing_relations: str, max_new_tokens: int
+    async def build_up_relation_graph(
+        self, text: str, existing_relations: str, max_new_tokens: int, render_svg: bool = False
     ):
         """
         This funciton is meant for iteratively building up the relation graph incrementally rather than all at once. Will return {"graph_svg": None, "relation_json": None} when finished
         """
-        relation_graph_dict = self.get_relation_graph(
-            text, existing_relations, max_new_tokens
+        relation_graph_dict = await self.get_relation_graph(
+            text, existing_relations, max_new_tokens, render_svg
         )
         return relation_graph_dict
 
-    def get_relation_graph(self, text: str, existing_relations: str = "", max_new_tokens: int = 2048):
-        entities = self.extract_entities_from_text(text)
-        generate_relations_json_prompt = RELATION_GRAPH_PROMPT
-        generate_relations_json_prompt += EXAMPLES_PROMPT.format(existing_relations=existing_relations)
-        generate_relations_json_prompt += GENERATION_PROMPT.format(text=text)
-        
-        messages = [{"role": "user", "content": generate_relations_json_prompt}]
+    def count_tokens(self, text: str):
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
 
-        chat_prompt = self.tokenizer.apply_chat_template(
-            messages, tokenize=False, add_generation_prompt=True
+    def select_existing_relations(self, text: str, existing_relations: str | list, token_budget: int):
+        """
+        Pick the existing relations worth showing the LLM for this chunk of text: only relations touching an entity
+        tagged in the chunk, those linking two tagged entities first, until token_budget tokens are used.
+        This keeps the prompt the same size however big the graph grows.
+        """
+        if isinstance(existing_relations, str):
+            relations = self.extract_json_from_text(existing_relations) if existing_relations else []
+        else:
+            relations = existing_relations
+        chunk_entities = {self.normalize_entity_name(entity) for entity in self.extract_entities_from_text(text)}
+
+        scored_relations = []
+        for item in relations:
+            score = (self.normalize_entity_name(item["entity1"]["entity"]) in chunk_entities) + (
+                self.normalize_entity_name(item["entity2"]["entity"]) in chunk_entities
+            )
+            if score > 0:
+                scored_relations.append((score, item))
+        scored_relations.sort(key=lambda scored: scored[0], reverse=True)
+
+        selected = []
+        used_tokens = 0
+        for _, item in scored_relations:
+            item_tokens = self.count_tokens(json.dumps(item, indent=4))
+            if used_tokens + item_tokens > token_budget:
+                continue
+            selected.append(item)
+            used_tokens += item_tokens
+
+        return selected, len(relations), used_tokens
+
+    def build_chat_prompt(self, text: str, existing_relations: str | list):
+        selected_relations, total_relations, relation_tokens = self.select_existing_relations(
+            text, existing_relations, Config.RELATION_CONTEXT_TOKEN_BUDGET
         )
-        
-        chat_prompt += " ["
+        variable_prompt = EXAMPLES_PROMPT.format(existing_relations=json.dumps(selected_relations, indent=4))
+        variable_prompt += GENERATION_PROMPT.format(text=text)
+
+        if self.prompt_prefix is not None:
+            suffix = variable_prompt + self.prompt_suffix + " ["
+            chat_prompt = self.prompt_prefix + suffix
+            prefix_tokens = self.prefix_tokens
+        else:
+            messages = [{"role": "user", "content": RELATION_GRAPH_PROMPT + variable_prompt}]
+            chat_prompt = self.tokenizer.apply_chat_template(
+                messages, tokenize=False, add_generation_prompt=True
+            )
+            chat_prompt += " ["
+            suffix = chat_prompt
+            prefix_tokens = 0
+
+        # Only the variable tail is tokenized per request
+        suffix_tokens = self.count_tokens(suffix)
+        self.prompt_count += 1
+        self.suffix_tokens_total += suffix_tokens
+        print(
+            f"Relation prompt tokens: {prefix_tokens} prefix + {suffix_tokens} suffix "
+            f"(existing relations: {len(selected_relations)}/{total_relations}, {relation_tokens} tokens)"
+        )
+        return chat_prompt
+
+    def get_prompt_stats(self):
+        return {
+            "prefix_compiled": self.prompt_prefix is not None,
+            "prefix_tokens": self.prefix_tokens,
+            "prompts": self.prompt_count,
+            "suffix_tokens_mean": self.suffix_tokens_total / self.prompt_count if self.prompt_count else None,
+        }
+
+    def relation_token_budget(self, text: str, max_new_tokens: int):
+        """
+        max_tokens for extracting the relations in text, estimated from the number of distinct tagged entities so
+        chunks with few entities don't reserve (and, without early stopping, generate) max_new_tokens. Text without
+        tagged entities gives nothing to estimate from, so it gets max_new_tokens.
+        """
+        if not Config.RELATION_ADAPTIVE_MAX_TOKENS:
+            return max_new_tokens
+
+        entities = len({self.normalize_entity_name(entity) for entity in self.extract_entities_from_text(text)})
+        if entities == 0:
+            return max_new_tokens
+        expected_relations = min(entities * (entities - 1) // 2, entities * Config.RELATION_RELATIONS_PER_ENTITY)
+        budget = Config.RELATION_MIN_NEW_TOKENS + expected_relations * Config.RELATION_TOKENS_PER_RELATION
+        return min(budget, max_new_tokens)
+
+    async def generate_relations(
+        self, text: str, existing_relations: str | list, max_new_tokens: int, usage: Counter = None
+    ):
+        """
+        Run the relation extraction prompt for text through the LLM and return the relations in its response.
+        Token usage is added to usage as well as the overall stats.
+        """
+        # Loading the tokenizer may download it, so don't do that on the event loop
+        await asyncio.to_thread(self.ensure_loaded)
+        chat_prompt = self.build_chat_prompt(text, existing_relations)
         print(chat_prompt)
-        gpt_response = self.gpt_client.get_gpt_response({}, generation_args={"max_tokens": max_new_tokens, "seed": self.seed}, prompt=chat_prompt)
+        generation_args = {"max_tokens": self.relation_token_budget(text, max_new_tokens), "seed": self.seed}
+        # The prompt ends with " [" so the model's output starts inside the list
+        parser = RelationStreamParser(array_open=True)
+
+        if Config.RELATION_EARLY_STOP:
+            async for _ in self.stream_response(chat_prompt, generation_args, parser, usage):
+                pass
+            return parser.relations
+
+        cache_key = self.llm_cache_key(chat_prompt, generation_args)
+        gpt_response = await self.get_cached_response(cache_key)
+        if gpt_response is not None:
+            parser.feed(gpt_response)
+            return parser.relations
+
+        gpt_response = await self.gpt_client.get_gpt_response({}, generation_args=generation_args, prompt=chat_prompt)
         print("====")
         print(gpt_response)
-        relations_json = self.extract_json_from_text(existing_relations + "\n" + gpt_response)
-        
+        parser.feed(gpt_response)
+        self.record_token_usage(generation_args, gpt_response, parser, False, usage)
+        # A response cut off by max_tokens would be replayed on every retry
+        if parser.array_closed:
+            await self.set_cached_response(cache_key, gpt_response)
+        return parser.relations
+
+    async def stream_response(
+        self, chat_prompt: str, generation_args: dict, parser: RelationStreamParser, usage: Counter = None
+    ):
+        """
+        Stream the LLM response to chat_prompt through parser, yielding the relations completed by each delta. With
+        RELATION_EARLY_STOP generation is cancelled as soon as the model closes the JSON list instead of running on
+        to max_tokens. The response is cached once the list is complete.
+        """
+        cache_key = self.llm_cache_key(chat_prompt, generation_args)
+        gpt_response = await self.get_cached_response(cache_key)
+        if gpt_response is not None:
+            yield parser.feed(gpt_response)
+            return
+
+        response_parts = []
+        stopped_early = False
+        stream = self.gpt_client.queue_async_job({}, stream=True, generation_args=generation_args, prompt=chat_prompt)
+        try:
+            async for delta in stream:
+                response_parts.append(delta)
+                yield parser.feed(delta)
+                if parser.array_closed and Config.RELATION_EARLY_STOP:
+                    stopped_early = True
+                    break
+        finally:
+            # Closing the stream part way cancels the generation
+            await stream.aclose()
+
+        # Only reached when the stream ran to completion or the list was closed, and responses cut off by max_tokens
+        # are left out too, so partial responses aren't cached
+        gpt_response = "".join(response_parts)
+        self.record_token_usage(generation_args, gpt_response, parser, stopped_early, usage)
+        if parser.array_closed:
+            await self.set_cached_response(cache_key, gpt_response)
+
+    def record_token_usage(
+        self,
+        generation_args: dict,
+        gpt_response: str,
+        parser: RelationStreamParser,
+        stopped_early: bool,
+        usage: Counter = None,
+    ):
+        """
+        Count the tokens the LLM generated for a response against the tokens actually used, those up to the end of
+        the JSON list. The difference is generation that was wasted, and that early stopping saves.
+        """
+        generated = self.count_tokens(gpt_response)
+        used = self.count_tokens(gpt_response[: parser.array_closed_at]) if parser.array_closed else generated
+        response_usage = {
+            "responses": 1,
+            "budget_tokens": generation_args["max_tokens"],
+            "generated_tokens": generated,
+            "used_tokens": used,
+            "stopped_early": int(stopped_early),
+            # Ran out of tokens before the list was closed, the budget may be too small
+            "truncated": int(not parser.array_closed),
+        }
+        self.token_usage.update(response_usage)
+        if usage is not None:
+            usage.update(response_usage)
+        print(
+            f"Relation response tokens: {generated} generated, {used} used, budget {generation_args['max_tokens']}"
+            f"{', stopped early' if stopped_early else ''}{', truncated' if not parser.array_closed else ''}"
+        )
+
+    def get_token_usage_stats(self):
+        return dict(self.token_usage)
+
+    def llm_cache_key(self, chat_prompt: str, generation_args: dict):
+        return make_cache_key("llm", self.llm_backend, chat_prompt, generation_args)
+
+    async def get_cached_response(self, cache_key):
+        if self.llm_cache is None:
+            return None
+        # The disk tier reads and commits to SQLite, so keep it off the event loop
+        return await asyncio.to_thread(self.llm_cache.get, cache_key)
+
+    async def set_cached_response(self, cache_key, gpt_response):
+        if self.llm_cache is not None:
+            await asyncio.to_thread(self.llm_cache.set, cache_key, gpt_response)
+
+    async def get_relation_graph(
+        self, text: str, existing_relations: str = "", max_new_tokens: int = 2048, render_svg: bool = False
+    ):
+        aliases = EntityAliasIndex()
+        existing_relations = aliases.canonicalize_relations(self.extract_json_from_text(existing_relations))
+        relations = await self.generate_relations(text, existing_relations, max_new_tokens)
+        # Resolved together so a longer name in the new relations also replaces the name in the existing ones
+        relations = aliases.canonicalize_relations(existing_relations + relations)
+        relation_set = RelationSet()
+        _, existing_removed = relation_set.merge(relations[: len(existing_relations)])
+        added, removed = relation_set.merge(relations[len(existing_relations) :])
+        relations_json = relation_set.to_list()
+        graph_svg = await self.get_graph_svg(relations_json) if render_svg else None
+
+        return {
+            "graph_svg": graph_svg,
+            "relation_json": relations_json,
+            "added": len(added),
+            "removed": existing_removed + removed,
+        }
+
+    async def stream_relations(self, text: str, existing_relations: str | list, max_new_tokens: int):
+        """
+        Yields each relation for text as soon as the LLM finishes writing it
+        """
+        await asyncio.to_thread(self.ensure_loaded)
+        chat_prompt = self.build_chat_prompt(text, existing_relations)
+        generation_args = {"max_tokens": self.relation_token_budget(text, max_new_tokens), "seed": self.seed}
+
+        # The prompt ends with " [" so the model's output starts inside the list
+        parser = RelationStreamParser(array_open=True)
+
+        start = time.perf_counter()
+        first_relation_seconds = None
+        async for relations in self.stream_response(chat_prompt, generation_args, parser):
+            for relation in relations:
+                if first_relation_seconds is None:
+                    first_relation_seconds = time.perf_counter() - start
+                yield relation
+        print(f"Streamed {len(parser.relations)} relations, first after {first_relation_seconds}s")
+
+    async def stream_relation_graph(
+        self, text: str, existing_relations: str = "", max_new_tokens: int = 2048, render_svg: bool = False
+    ):
+        """
+        Streamed version of get_relation_graph. Yields ("relation", relation) for every new relation as soon as the
+        LLM finishes writing it, ("renamed", {label: {old name: new name}}) when a longer alias renames entities in
+        relations already sent, then ("graph", {"graph_svg", "relation_json", "added", "removed"}) once generation
+        is done.
+        """
+        aliases = EntityAliasIndex()
+        relation_set = RelationSet()
+        _, removed = relation_set.merge(aliases.canonicalize_relations(self.extract_json_from_text(existing_relations)))
+        # Existing relations were canonicalised as one batch, the graph event has them under their final names
+        aliases.take_renames()
+        added_count = 0
+        async for relation in self.stream_relations(text, relation_set.to_list(), max_new_tokens):
+            canonical = aliases.canonicalize_relations([relation])
+            renamed = aliases.take_renames()
+            if renamed:
+                relation_set = RelationSet(rename_entities(relation_set.to_list(), renamed))
+                yield "renamed", renamed
+            added, relation_removed = relation_set.merge(canonical)
+            removed += relation_removed
+            for added_relation in added:
+                added_count += 1
+                yield "relation", added_relation
+
+        relations_json = relation_set.to_list()
+        graph_svg = await self.get_graph_svg(relations_json) if render_svg else None
+        yield "graph", {
+            "graph_svg": graph_svg,
+            "relation_json": relations_json,
+            "added": added_count,
+            "removed": removed,
+        }
+
+    def create_graph(self):
+        return {"graph_id": self.graph_store.create()}
+
+    def get_graph(self, graph_id: str):
+        return {"graph_id": graph_id, "relation_json": self.graph_store.get(graph_id)}
+
+    def delete_graph(self, graph_id: str):
+        self.graph_store.delete(graph_id)
+
+    async def render_graph(self, graph_id: str):
+        relations_json = self.graph_store.get(graph_id)
+        return {"graph_id": graph_id, "graph_svg": await self.get_graph_svg(relations_json)}
+
+    async def extend_graph(self, graph_id: str, text: str, max_new_tokens: int = 2048):
+        """
+        Extract relations from the next chunk of text into a stored graph. Only the relations added are returned,
+        so the request and response stay the same size however big the graph grows.
+        """
+        existing_relations = self.graph_store.get(graph_id)
+        relations = await self.generate_relations(text, existing_relations, max_new_tokens)
+        added_relations, removed, renamed = self.graph_store.add_relations(graph_id, relations)
+        return {
+            "graph_id": graph_id,
+            "added_relations": added_relations,
+            "added": len(added_relations),
+            "removed": removed,
+            "renamed": renamed,
+            "relation_count": self.graph_store.relation_count(graph_id),
+        }
+
+    async def stream_extend_graph(self, graph_id: str, text: str, max_new_tokens: int = 2048):
+        """
+        Streamed version of extend_graph. Yields ("relation", relation) for every relation added to the graph as the
+        LLM writes it, ("renamed", {label: {old name: new name}}) when a longer alias renames entities already sent
+        or stored, then ("done", {"graph_id", "added", "removed", "relation_count"}).
+        """
+        existing_relations = self.graph_store.get(graph_id)
+        added_count = 0
+        removed = 0
+        async for relation in self.stream_relations(text, existing_relations, max_new_tokens):
+            added, relation_removed, renamed = self.graph_store.add_relations(graph_id, [relation])
+            removed += relation_removed
+            if renamed:
+                yield "renamed", renamed
+            for added_relation in added:
+                added_count += 1
+                yield "relation", added_relation
+        yield "done", {
+            "graph_id": graph_id,
+            "added": added_count,
+            "removed": removed,
+            "relation_count": self.graph_store.relation_count(graph_id),
+        }
+
+    async def get_document_relation_graph(
+        self,
+        text: str,
+        max_new_tokens: int = 2048,
+        concurrency: int = None,
+        min_chunk_size: int = 2000,
+        render_svg: bool = False,
+        progress=None,
+    ):
+        """
+        Map-reduce relation extraction over a whole tagged document. Every chunk is sent to the LLM at once, up to
+        concurrency at a time, then the per-chunk relations are merged into one graph. Wall clock time follows the
+        slowest chunk rather than the sum of all chunks. progress(done, total) is called as each chunk finishes.
+        max_new_tokens caps each chunk's estimated token budget.
+        """
+        if concurrency is None or concurrency < 1:
+            concurrency = Config.RELATION_CONCURRENCY
+
+        start = time.perf_counter()
+        chunks = chunk_text(text, min_chunk_size)
+        chunking_seconds = time.perf_counter() - start
+
+        semaphore = asyncio.Semaphore(concurrency)
+        usage = Counter()
+        chunk_timings = [None] * len(chunks)
+        chunks_done = 0
+        if progress is not None:
+            progress(0, len(chunks))
+
+        async def extract_chunk(i, chunk):
+            async with semaphore:
+                chunk_start = time.perf_counter()
+                try:
+                    return await self.generate_relations(chunk, "", max_new_tokens, usage)
+                finally:
+                    chunk_timings[i] = time.perf_counter() - chunk_start
+                    nonlocal chunks_done
+                    chunks_done += 1
+                    if progress is not None:
+                        progress(chunks_done, len(chunks))
+
+        extraction_start = time.perf_counter()
+        chunk_results = await asyncio.gather(
+            *(extract_chunk(i, chunk) for i, chunk in enumerate(chunks)), return_exceptions=True
+        )
+        extraction_seconds = time.perf_counter() - extraction_start
+
+        errors = {}
+        relation_lists = []
+        for i, result in enumerate(chunk_results):
+            if isinstance(result, Exception):
+                errors[i] = f"{type(result).__name__}: {result}"
+            else:
+                relation_lists.append(result)
+
+        merge_start = time.perf_counter()
+        # Entity aliases are resolved across every chunk at once, so each entity gets its longest name
+        aliases = EntityAliasIndex()
+        relations = aliases.canonicalize_relations(item for relations in relation_lists for item in relations)
+        relations_json = self.merge_relations([relations])
+        merge_seconds = time.perf_counter() - merge_start
+
+        render_start = time.perf_counter()
+        graph_svg = await self.get_graph_svg(relations_json) if render_svg else None
+        render_seconds = time.perf_counter() - render_start
+
+        return {
+            "graph_svg": graph_svg,
+            "relation_json": relations_json,
+            "chunk_errors": errors,
+            "tokens": dict(usage),
+            "timings": {
+                "chunks": len(chunks),
+                "concurrency": concurrency,
+                "chunking_seconds": chunking_seconds,
+                "extraction_seconds": extraction_seconds,
+                "chunk_seconds": chunk_timings,
+                "chunk_seconds_sum": sum(t for t in chunk_timings if t is not None),
+                "merge_seconds": merge_seconds,
+                "render_seconds": render_seconds,
+                "total_seconds": time.perf_counter() - start,
+            },
+        }
+
+    def normalize_entity_name(self, entity):
+        return normalize_entity_name(entity)
+
+    def merge_relations(self, relation_lists):
+        """
+        Reconcile relations extracted from separate chunks. Entity names that only differ by case, whitespace,
+        punctuation or tags are unified under their most common spelling, and relations that repeat the same
+        relation between the same pair of entities, in either direction, are dropped.
+        """
+        name_counts = {}
+        for relations in relation_lists:
+            for item in relations:
+                for entity_key in ("entity1", "entity2"):
+                    name = " ".join(self.strip_angle_brackets(item[entity_key]["entity"]).split())
+                    name_counts.setdefault(self.normalize_entity_name(name), Counter())[name] += 1
+
+        # Most common spelling wins, ties go to the longest (most complete) name
+        canonical_names = {
+            key: max(counts.items(), key=lambda name_count: (name_count[1], len(name_count[0])))[0]
+            for key, counts in name_counts.items()
+        }
+
+        relation_set = RelationSet()
+        for relations in relation_lists:
+            relation_set.merge(
+                {
+                    **item,
+                    "entity1": {**item["entity1"], "entity": canonical_names[self.normalize_entity_name(item["entity1"]["entity"])]},
+                    "entity2": {**item["entity2"], "entity": canonical_names[self.normalize_entity_name(item["entity2"]["entity"])]},
+                }
+                for item in relations
+            )
+
+        return relation_set.to_list()
+
+    def render_graph_svg(self, relations_json):
         dot_graph = self.json_to_dot(relations_json)
 
         dot_graph = dot_graph.replace("}", 'rankdir="LR";}')
@@ -160,7 +671,24 @@ class RelationProcessor:
         # Convert the graph to SVG format
         graph_svg = graph.pipe(format="svg").decode("utf-8").strip()
 
-        return {"graph_svg": graph_svg, "relation_json": relations_json}
+        return graph_svg
+
+    async def get_graph_svg(self, relations_json):
+        """
+        Render relations_json to svg in the render pool, reusing the cached svg when the same relations were already
+        rendered
+        """
+        key = make_cache_key("graph_svg", relations_json)
+        graph_svg = self.svg_cache.get(key)
+        if graph_svg is None:
+            loop = asyncio.get_running_loop()
+            graph_svg = await loop.run_in_executor(self.render_executor, self.render_graph_svg, relations_json)
+            self.svg_cache.set(key, graph_svg)
+        return graph_svg
+
+    async def close(self):
+        await self.gpt_client.close()
+        self.render_executor.shutdown(wait=False)
 
 
 relation_processor = RelationProcessor()
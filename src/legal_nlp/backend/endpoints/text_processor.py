@@ -1,31 +1,228 @@
-import spacy
+import threading
 from config import Config
+from utils.lazy_model import LazyModel
+from utils.result_cache import ResultCache, make_cache_key
+from utils.label_sets import LabelSet
+from utils.micro_batcher import MicroBatcher
+from nlp.worker_pool import NerWorkerPool
 
+# Part of every NER cache key. Bump it whenever the shape of cached results changes so results written by an older
+# version to the persistent cache are missed rather than returned.
+NER_RESULT_VERSION = 2
 
-class TextProcessor:
+
+class TextProcessor(LazyModel):
     def __init__(self):        
+        super().__init__()
         self.custom_spacy_config = { "gliner_model": "EmergentMethods/gliner_medium_news-v2.1",
                             "chunk_size": 250,
                             "labels": ["people","company"],
                             "style": "ent"}
-        self.nlp = spacy.blank("en")
-        self.nlp.add_pipe("gliner_spacy", config=self.custom_spacy_config)
 
-    def process_text(self, text: str, labels: list[str]):
-        # Change gliner_spacy labels to the labels provided
+        self.cache = ResultCache(
+            Config.NER_CACHE_MAX_BYTES, Config.NER_CACHE_DB_PATH, Config.NER_CACHE_MAX_DISK_BYTES
+        )
+        # Blocks get their own cache so they don't evict whole documents and their hit rate is reported apart
+        self.block_cache = ResultCache(
+            Config.NER_BLOCK_CACHE_MAX_BYTES, Config.NER_BLOCK_CACHE_DB_PATH, Config.NER_BLOCK_CACHE_MAX_DISK_BYTES
+        )
+
+        self.nlp = None
+        self.worker_pool = None
+        self.batcher = None
+
+    def load_model(self):
+        # spaCy and gliner are imported here as importing them pulls in torch and transformers, which is slow
+        import spacy
+
+        # Registers the gliner_request_labels spaCy factory
+        from nlp import gliner_component
+
+        nlp = spacy.blank("en")
+        # Labels are passed per call rather than set on the shared pipe so concurrent requests don't race
+        nlp.add_pipe("gliner_request_labels", name="gliner_spacy", config=self.custom_spacy_config)
+
+        # Cache entities per paragraph block too so edited documents only re-run the changed paragraphs
+        gliner_spacy_pipe = nlp.get_pipe("gliner_spacy")
+        gliner_spacy_pipe.block_cache = self.block_cache
+        gliner_spacy_pipe.max_block_size = Config.NER_MAX_BLOCK_SIZE
+
+        # Fork the worker processes now the model is loaded, before the model has started any threads of its own.
+        # Forking while other threads run can leave locks they hold locked forever in the workers, so this only
+        # happens when loading on startup (see launch.py) and NER runs in this process otherwise.
+        run_chunk_batch = gliner_spacy_pipe.predict_chunk_batch
+        if Config.NER_WORKERS > 0 and threading.active_count() > 1:
+            print("Other threads are running, NER worker processes can't be forked safely, running NER in process")
+        elif Config.NER_WORKERS > 0:
+            self.worker_pool = NerWorkerPool(run_chunk_batch, Config.NER_WORKERS, Config.NER_WORKER_THREADS)
+            gliner_spacy_pipe.worker_pool = self.worker_pool
+            run_chunk_batch = self.worker_pool.run
+
+        # Coalesce chunks from concurrent requests into shared forward passes
+        gliner_spacy_pipe.max_batch_size = Config.NER_BATCH_MAX_SIZE
+        if Config.NER_MICRO_BATCHING:
+            self.batcher = MicroBatcher(
+                run_chunk_batch,
+                Config.NER_BATCH_MAX_SIZE,
+                Config.NER_BATCH_MAX_WAIT_MS,
+                max_concurrent_batches=max(1, Config.NER_WORKERS),
+            )
+            gliner_spacy_pipe.batcher = self.batcher
+
+        self.nlp = nlp
+
+    def component_cfg(self, label_set):
+        return {"gliner_spacy": {"labels": label_set}}
+
+    def cache_key(self, text: str, label_set):
+        return make_cache_key("ner", NER_RESULT_VERSION, text, label_set.key)
+
+    def process_text(self, text: str, labels: list[str], include_tagged_text: bool = False):
+        label_set = LabelSet(labels)
+        cache_key = self.cache_key(text, label_set)
+        result = self.cache.get(cache_key)
+        if result is None:
+            self.ensure_loaded()
+            doc = self.nlp(text, component_cfg=self.component_cfg(label_set))
+            result = self.doc_to_dict(doc)
+            self.cache.set(cache_key, result)
+
+        if include_tagged_text:
+            result["tagged_text"] = self.tag_text(text, result["entities"])
+
+        return result
+
+    def process_text_stream(self, text: str, labels: list[str], include_tagged_text: bool = False):
+        """
+        Yields NER results one paragraph block at a time so callers can render entities before the whole document
+        has been through the model. Each update covers text[start_char:end_char].
+        """
+        label_set = LabelSet(labels)
+        cache_key = self.cache_key(text, label_set)
+        result = self.cache.get(cache_key)
+        if result is not None:
+            update = {"start_char": 0, "end_char": len(text), "ner_tags": result["ner_tags"], "entities": result["entities"]}
+            if include_tagged_text:
+                update["tagged_text"] = self.tag_text(text, result["entities"])
+            yield update
+            return
+
+        self.ensure_loaded()
         gliner_spacy_pipe = self.nlp.get_pipe("gliner_spacy")
-        gliner_spacy_pipe.labels = labels
-        
-        doc = self.nlp(text)
-        # Process the text here
+        doc = self.nlp.make_doc(text)
+
+        all_entities = []
+        for block_offset, block, block_entities in gliner_spacy_pipe.iter_block_entities(text, label_set):
+            all_entities.extend(block_entities)
+            spans = [doc.char_span(entity["start"], entity["end"], label=entity["label"]) for entity in block_entities]
+            spans = [span for span in spans if span is not None]
+            update = {
+                "start_char": block_offset,
+                "end_char": block_offset + len(block),
+                "ner_tags": [(span.text, span.label_) for span in spans],
+                "entities": self.spans_to_entities(spans),
+            }
+            if include_tagged_text:
+                update["tagged_text"] = self.tag_text(text, update["entities"], block_offset, block_offset + len(block))
+            yield update
+
+        doc = gliner_spacy_pipe._create_entity_spans(doc, all_entities)
+        self.cache.set(cache_key, self.doc_to_dict(doc))
+
+    def process_batch(
+        self, texts: list[str], labels: list[str], batch_size: int = None, include_tagged_text: bool = False
+    ):
+        """
+        Run NER over many documents using nlp.pipe. Results are returned in the same order as texts,
+        a document that fails is returned as {"error": ...} rather than failing the whole batch.
+        """
+        if batch_size is None or batch_size < 1:
+            batch_size = Config.NER_BATCH_SIZE
+
+        label_set = LabelSet(labels)
+        component_cfg = self.component_cfg(label_set)
+
+        # Only documents that aren't already cached go through the model
+        cache_keys = [self.cache_key(text, label_set) for text in texts]
+        results = [self.cache.get(cache_key) for cache_key in cache_keys]
+        pending = [i for i, result in enumerate(results) if result is None]
+        if pending:
+            self.ensure_loaded()
+
+        for start in range(0, len(pending), batch_size):
+            batch_ids = pending[start : start + batch_size]
+            batch = [texts[i] for i in batch_ids]
+            try:
+                docs = list(self.nlp.pipe(batch, batch_size=batch_size, component_cfg=component_cfg))
+            except Exception:
+                # Re-run the batch one document at a time to find which documents failed
+                docs = []
+                for text in batch:
+                    try:
+                        docs.append(self.nlp(text, component_cfg=component_cfg))
+                    except Exception as e:
+                        docs.append(e)
+
+            for i, doc in zip(batch_ids, docs):
+                if isinstance(doc, Exception):
+                    results[i] = {"error": f"{type(doc).__name__}: {doc}"}
+                else:
+                    results[i] = self.doc_to_dict(doc)
+                    self.cache.set(cache_keys[i], results[i])
+
+        if include_tagged_text:
+            for text, result in zip(texts, results):
+                if "entities" in result:
+                    result["tagged_text"] = self.tag_text(text, result["entities"])
+
+        return results
+
+    def doc_to_dict(self, doc):
         return {
             "tokens": [token.text for token in doc],
             "pos_tags": [token.pos_ for token in doc],
             "ner_tags": [(ent.text, ent.label_) for ent in doc.ents],
+            "entities": self.spans_to_entities(doc.ents),
         }
 
+    def spans_to_entities(self, spans):
+        return [
+            {"text": span.text, "label": span.label_, "start_char": span.start_char, "end_char": span.end_char}
+            for span in spans
+        ]
+
+    def tag_text(self, text: str, entities: list[dict], start_char: int = 0, end_char: int = None):
+        """
+        Wrap each entity in text[start_char:end_char] with <LABEL>...</LABEL> tags in a single pass over the text.
+        Entities must be sorted and non-overlapping, as returned by doc_to_dict.
+        """
+        if end_char is None:
+            end_char = len(text)
+
+        tagged_parts = []
+        current_index = start_char
+        for entity in entities:
+            tagged_parts.append(text[current_index : entity["start_char"]])
+            tagged_parts.append(f'<{entity["label"]}>{text[entity["start_char"] : entity["end_char"]]}</{entity["label"]}>')
+            current_index = entity["end_char"]
+        tagged_parts.append(text[current_index:end_char])
+
+        return "".join(tagged_parts)
+
     def get_ner_labels(self):
         return self.custom_spacy_config["labels"]
 
+    def get_cache_stats(self):
+        return self.cache.stats()
+
+    def get_block_cache_stats(self):
+        return self.block_cache.stats()
+
+    def get_batching_stats(self):
+        workers = self.worker_pool.processes if self.worker_pool is not None else 0
+        if self.batcher is None:
+            return {"enabled": Config.NER_MICRO_BATCHING, "workers": workers}
+        return {"enabled": True, "workers": workers, **self.batcher.stats()}
+
 
 text_processor = TextProcessor()
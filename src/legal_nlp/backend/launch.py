@@ -1,10 +1,40 @@
+import traceback
 from fastapi import FastAPI
 from routes import router
+from config import Config
+from endpoints.text_processor import text_processor
+from endpoints.relation_processor import relation_processor
+from endpoints.relation_jobs import relation_jobs
 
 try:
     app = FastAPI()
 
     app.include_router(router)
 
+    @app.on_event("startup")
+    async def warm_up_models():
+        if Config.NER_WORKERS > 0:
+            # NER worker processes are forked from this process, which is only safe while no other thread is running,
+            # so the NER model is loaded here, before the warm-up threads start, even though it holds up startup.
+            # If it fails the backend still starts, /ready reports the error and the first NER request loads the
+            # model again, in-process as by then other threads are running.
+            try:
+                text_processor.ensure_loaded()
+            except Exception:
+                traceback.print_exc()
+        # Models load in the background so /health and /ready answer while they load
+        if Config.WARM_UP_MODELS:
+            text_processor.warm_up()
+            relation_processor.warm_up()
+
+    @app.on_event("startup")
+    async def start_relation_jobs():
+        await relation_jobs.start()
+
+    @app.on_event("shutdown")
+    async def close_clients():
+        await relation_jobs.stop()
+        await relation_processor.close()
+
 except Exception as e:
     print(f"****>>>>> Error: {e}")
\ No newline at end of file
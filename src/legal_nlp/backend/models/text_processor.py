@@ -3,8 +3,32 @@ from pydantic import BaseModel
 class TextRequest(BaseModel):
     text: str
     labels: list[str]
-    
+    include_tagged_text: bool = False
+
+
+class TextBatchRequest(BaseModel):
+    texts: list[str]
+    labels: list[str]
+    batch_size: int | None = None
+    include_tagged_text: bool = False
+
+
 class RelationRequest(BaseModel):
     text: str
     existing_relations: str
-    max_new_tokens: int
\ No newline at end of file
+    # Upper limit, the token budget is estimated from the entities in text
+    max_new_tokens: int = 2048
+    render_svg: bool = False
+
+
+class RelationGraphExtendRequest(BaseModel):
+    text: str
+    max_new_tokens: int = 2048
+
+
+class RelationDocumentRequest(BaseModel):
+    text: str
+    max_new_tokens: int = 2048
+    concurrency: int | None = None
+    min_chunk_size: int = 2000
+    render_svg: bool = False
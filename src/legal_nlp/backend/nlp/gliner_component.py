@@ -0,0 +1,187 @@
+from itertools import islice
+from spacy.language import Language
+from gliner_spacy.pipeline import GlinerSpacy, DEFAULT_SPACY_CONFIG
+from utils.result_cache import make_cache_key
+from utils.label_sets import LabelSet
+from nlp.text_blocks import split_blocks
+
+
+@Language.factory(
+    "gliner_request_labels",
+    assigns=["doc.ents"],
+    default_config=DEFAULT_SPACY_CONFIG,
+)
+class RequestLabelsGliner(GlinerSpacy):
+    """
+    gliner_spacy component that accepts the labels per call instead of reading the shared self.labels attribute,
+    so concurrent requests with different label sets can share one loaded model.
+
+    Labels are passed with spaCy's component_cfg, e.g. nlp(text, component_cfg={"gliner_spacy": {"labels": labels}}),
+    either as a list or as a prepared LabelSet.
+
+    Documents are split into paragraph blocks and, when block_cache is set, each block's entities are cached so
+    re-processing an edited document only runs inference on the blocks that changed.
+    """
+
+    block_cache = None
+    batcher = None
+    worker_pool = None
+    max_block_size = 2000
+    max_batch_size = 16
+
+    def __call__(self, doc, labels=None):
+        labels = self.to_label_set(labels)
+
+        all_entities = []
+        for _, _, block_entities in self.iter_block_entities(doc.text, labels):
+            all_entities.extend(block_entities)
+
+        return self._create_entity_spans(doc, all_entities)
+
+    def pipe(self, docs, batch_size=None, labels=None):
+        """
+        The blocks of up to batch_size docs are predicted together, so the chunks of short documents share forward
+        passes instead of each document running its own
+        """
+        labels = self.to_label_set(labels)
+        docs = iter(docs)
+        while True:
+            batch = list(islice(docs, batch_size or 1))
+            if not batch:
+                return
+
+            doc_blocks = [self.split_blocks(doc.text) for doc in batch]
+            all_blocks = [block for blocks in doc_blocks for _, block in blocks]
+            all_block_entities = iter(self.predict_blocks(all_blocks, labels))
+            for doc, blocks in zip(batch, doc_blocks):
+                all_entities = []
+                for (block_offset, _), block_entities in zip(blocks, all_block_entities):
+                    all_entities.extend(
+                        {**entity, "start": block_offset + entity["start"], "end": block_offset + entity["end"]}
+                        for entity in block_entities
+                    )
+                yield self._create_entity_spans(doc, all_entities)
+
+    def to_label_set(self, labels):
+        if labels is None:
+            labels = self.labels
+        if isinstance(labels, LabelSet):
+            return labels
+        return LabelSet(labels)
+
+    def iter_block_entities(self, text, labels):
+        """
+        Yields (block_offset, block, entities) one paragraph block at a time, with entity offsets in document coordinates
+        """
+        labels = self.to_label_set(labels)
+        for block_offset, block in self.split_blocks(text):
+            block_entities = [
+                {**entity, "start": block_offset + entity["start"], "end": block_offset + entity["end"]}
+                for entity in self.predict_block(block, labels)
+            ]
+            yield block_offset, block, block_entities
+
+    def predict_block(self, block, labels):
+        """
+        Entities for a single block with offsets relative to the start of the block
+        """
+        return self.predict_blocks([block], labels)[0]
+
+    def predict_blocks(self, blocks, labels):
+        """
+        Entities for each block with offsets relative to the start of the block. The chunks of every block that isn't
+        cached go through predict_chunks in one call.
+        """
+        results = [None] * len(blocks)
+        cache_keys = [None] * len(blocks)
+        if self.block_cache is not None:
+            for i, block in enumerate(blocks):
+                cache_keys[i] = make_cache_key(
+                    "ner_block", block, labels.key, self.chunk_size, self.threshold, self.style
+                )
+                results[i] = self.block_cache.get(cache_keys[i])
+
+        # (block index, offset in block, chunk) for the blocks that need the model
+        chunks = [
+            (i, offset, chunk)
+            for i, block in enumerate(blocks)
+            if results[i] is None
+            for offset, chunk in self.chunk_text(block)
+        ]
+        all_chunk_entities = self.predict_chunks([chunk for _, _, chunk in chunks], labels) if chunks else []
+
+        predicted = [i for i, result in enumerate(results) if result is None]
+        for i in predicted:
+            results[i] = []
+        for (i, offset, _), chunk_entities in zip(chunks, all_chunk_entities):
+            for entity in chunk_entities:
+                results[i].append({
+                    "start": offset + entity["start"],
+                    "end": offset + entity["end"],
+                    "label": entity["label"],
+                    "score": entity["score"],
+                })
+
+        if self.block_cache is not None:
+            for i in predicted:
+                self.block_cache.set(cache_keys[i], results[i])
+
+        return results
+
+    def predict_chunks(self, chunks, labels):
+        """
+        Entities for each chunk. When a batcher is set chunks are coalesced with other requests' chunks into shared
+        forward passes, otherwise these chunks are run as one batch, in a worker process if there is a pool.
+        """
+        jobs = [(chunk, tuple(labels.labels)) for chunk in chunks]
+        if self.batcher is not None:
+            return self.batcher.map(jobs)
+        if self.worker_pool is not None:
+            return self.worker_pool.run(jobs)
+
+        return self.predict_chunk_batch(jobs)
+
+    def predict_chunk_batch(self, jobs):
+        """
+        Run (chunk, labels) jobs through the model, with one batched forward pass per distinct label set
+        """
+        results = [None] * len(jobs)
+        label_groups = {}
+        for i, (_, labels) in enumerate(jobs):
+            label_groups.setdefault(labels, []).append(i)
+
+        for labels, job_ids in label_groups.items():
+            for start in range(0, len(job_ids), self.max_batch_size):
+                batch_ids = job_ids[start : start + self.max_batch_size]
+                batch_entities = self.model.batch_predict_entities(
+                    [jobs[i][0] for i in batch_ids],
+                    list(labels),
+                    flat_ner=self.style != "span",
+                    threshold=self.threshold,
+                )
+                for i, entities in zip(batch_ids, batch_entities):
+                    results[i] = entities
+
+        return results
+
+    def split_blocks(self, text):
+        """
+        Split text into (offset, block) paragraphs, see nlp.text_blocks.split_blocks
+        """
+        return split_blocks(text, self.max_block_size)
+
+    def chunk_text(self, text):
+        """
+        Split text into (offset, chunk) pairs of roughly chunk_size characters, ending chunks on whitespace
+        """
+        chunks = []
+        start = 0
+        while start < len(text):
+            end = min(start + self.chunk_size, len(text))
+            # Ensure the chunk ends at a complete word
+            while end < len(text) and text[end] not in [" ", "\n"]:
+                end += 1
+            chunks.append((start, text[start:end]))
+            start = end
+
+        return chunks
@@ -0,0 +1,77 @@
+import re
+
+PARAGRAPH_SEPARATOR = re.compile(r"\n[ \t]*\n")
+# End of a sentence and the whitespace after it, the next sentence starts at the end of the match
+SENTENCE_END = re.compile(r"[.?!:;][\"')\]]*\s+")
+LAST_WORD = re.compile(r"[\w.]+$")
+# Words ending in a full stop that don't end a sentence, initials are handled separately
+ABBREVIATIONS = {
+    "mr", "mrs", "ms", "dr", "prof", "hon", "st", "no", "nos", "v", "vs", "s", "ss", "cl", "pt", "para", "paras",
+    "reg", "sch", "ch", "j", "jj", "cj", "co", "pty", "ltd", "inc", "etc", "eg", "ie", "al",
+}
+
+
+def split_blocks(text: str, max_block_size: int):
+    """
+    Split text into (offset, block) paragraphs. Block boundaries only depend on the text next to them, so an edit
+    inside one paragraph leaves every other block, and its cached entities, unchanged.
+    """
+    blocks = []
+    start = 0
+    for match in PARAGRAPH_SEPARATOR.finditer(text):
+        blocks.extend(split_long_block(start, text[start : match.end()], max_block_size))
+        start = match.end()
+
+    if start < len(text):
+        blocks.extend(split_long_block(start, text[start:], max_block_size))
+
+    return blocks
+
+
+def split_long_block(offset: int, block: str, max_block_size: int):
+    """
+    Paragraphs longer than max_block_size (e.g. text extracted from PDFs with no blank lines) are split after each
+    sentence, whether or not it ends a line, and sentences still longer than that at the last whitespace before it
+    """
+    if len(block) <= max_block_size:
+        return [(offset, block)]
+
+    blocks = []
+    start = 0
+    for end in [*sentence_ends(block), len(block)]:
+        while end - start > max_block_size:
+            cut = whitespace_cut(block, start, max_block_size)
+            blocks.append((offset + start, block[start:cut]))
+            start = cut
+        if end > start:
+            blocks.append((offset + start, block[start:end]))
+            start = end
+
+    return blocks
+
+
+def sentence_ends(text: str):
+    """
+    Offsets in text where a sentence ends, after the whitespace that follows it
+    """
+    ends = []
+    for match in SENTENCE_END.finditer(text):
+        if text[match.start()] == ".":
+            # "Mr. Doe", "s. 51", "J. Smith" and "e.g. this" carry on the same sentence
+            word = LAST_WORD.search(text, max(match.start() - 16, 0), match.start())
+            word = word.group().replace(".", "").casefold() if word is not None else ""
+            if len(word) <= 1 or word in ABBREVIATIONS:
+                continue
+        ends.append(match.end())
+    return ends
+
+
+def whitespace_cut(text: str, start: int, max_size: int):
+    """
+    End of the longest piece of text from start, at most max_size long, that ends after whitespace. Text with no
+    whitespace is cut at max_size.
+    """
+    for cut in range(start + max_size - 1, start, -1):
+        if text[cut].isspace():
+            return cut + 1
+    return start + max_size
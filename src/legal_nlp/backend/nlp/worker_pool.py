@@ -0,0 +1,37 @@
+import multiprocessing
+
+# Set in the parent before forking so the workers inherit the already loaded model instead of loading their own
+_batch_fn = None
+
+
+def _init_worker(num_threads):
+    import torch
+
+    # Each worker gets its own core(s), without this every worker spins up a thread per core and they fight
+    torch.set_num_threads(num_threads)
+
+
+def _run_batch(jobs):
+    return _batch_fn(jobs)
+
+
+class NerWorkerPool:
+    """
+    Pool of pre-forked NER worker processes. The model is loaded once in the parent and the workers are forked from
+    it, so the weights are shared copy-on-write instead of memory growing with the number of workers.
+    """
+
+    def __init__(self, batch_fn, processes: int, threads_per_process: int = 1):
+        global _batch_fn
+        _batch_fn = batch_fn
+
+        self.processes = processes
+        self.pool = multiprocessing.get_context("fork").Pool(
+            processes, initializer=_init_worker, initargs=(threads_per_process,)
+        )
+
+    def run(self, jobs):
+        return self.pool.apply(_run_batch, (jobs,))
+
+    def close(self):
+        self.pool.terminate()
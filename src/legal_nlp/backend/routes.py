@@ -1,14 +1,57 @@
-from fastapi import APIRouter
+import json
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from endpoints.text_processor import text_processor
 from endpoints.relation_processor import relation_processor
-from models.text_processor import TextRequest, RelationRequest
+from endpoints.relation_jobs import relation_jobs
+from utils.job_queue import FINISHED_STATUSES
+from models.text_processor import (
+    TextRequest,
+    TextBatchRequest,
+    RelationRequest,
+    RelationGraphExtendRequest,
+    RelationDocumentRequest,
+)
 
 router = APIRouter()
 
 
+@router.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+async def ready(response: Response):
+    models = {
+        "ner": text_processor.load_status(),
+        "relation_tokenizer": relation_processor.load_status(),
+    }
+    is_ready = text_processor.is_ready() and relation_processor.is_ready()
+    if not is_ready:
+        response.status_code = 503
+    return {"ready": is_ready, "models": models}
+
+
+# NER routes are sync so FastAPI runs them in its threadpool, letting requests run inference in parallel
 @router.post("/process_text/")
-async def process_text(request: TextRequest):
-    return text_processor.process_text(request.text, request.labels)
+def process_text(request: TextRequest):
+    return text_processor.process_text(request.text, request.labels, request.include_tagged_text)
+
+
+@router.post("/process_text_stream/")
+def process_text_stream(request: TextRequest):
+    # Newline delimited JSON, one line per paragraph block
+    updates = text_processor.process_text_stream(request.text, request.labels, request.include_tagged_text)
+    lines = (json.dumps(update) + "\n" for update in updates)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
+@router.post("/process_text_batch/")
+def process_text_batch(request: TextBatchRequest):
+    return text_processor.process_batch(
+        request.texts, request.labels, request.batch_size, request.include_tagged_text
+    )
 
 
 @router.get("/ner_labels/")
@@ -16,15 +59,196 @@ async def get_ner_labels():
     return text_processor.get_ner_labels()
 
 
+@router.get("/cache_stats/")
+async def get_cache_stats():
+    return {
+        "ner": text_processor.get_cache_stats(),
+        "ner_blocks": text_processor.get_block_cache_stats(),
+        "graph_svg": relation_processor.svg_cache.stats(),
+        "llm": relation_processor.llm_cache.stats() if relation_processor.llm_cache is not None else None,
+    }
+
+
+@router.get("/ner_batching_stats/")
+async def get_ner_batching_stats():
+    return text_processor.get_batching_stats()
+
+
+@router.get("/llm_client_stats/")
+async def get_llm_client_stats():
+    return relation_processor.gpt_client.stats()
+
+
+@router.get("/relation_prompt_stats/")
+async def get_relation_prompt_stats():
+    return relation_processor.get_prompt_stats()
+
+
+@router.get("/relation_token_stats/")
+async def get_relation_token_stats():
+    return relation_processor.get_token_usage_stats()
+
+
 @router.post("/get_entity_relations/")
 async def get_ner_labels(request: RelationRequest):
-    return relation_processor.get_relation_graph(
-        request.text, request.existing_relations, request.max_new_tokens
+    return await relation_processor.get_relation_graph(
+        request.text, request.existing_relations, request.max_new_tokens, request.render_svg
     )
 
 
 @router.post("/extend_entity_relations/")
 async def get_ner_labels(request: RelationRequest):
-    return relation_processor.build_up_relation_graph(
-        request.text, request.existing_relations, request.max_new_tokens
+    return await relation_processor.build_up_relation_graph(
+        request.text, request.existing_relations, request.max_new_tokens, request.render_svg
     )
+
+
+@router.post("/extend_entity_relations_stream/")
+async def extend_entity_relations_stream(request: RelationRequest):
+    # Server-sent events, a relation event per relation as the LLM writes it, renamed events when a longer alias
+    # renames entities in relations already sent, and a final graph event. The status code has already been sent
+    # when the stream fails part way, so failures are sent as an error event instead.
+    async def events():
+        try:
+            async for event, data in relation_processor.stream_relation_graph(
+                request.text, request.existing_relations, request.max_new_tokens, request.render_svg
+            ):
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        except Exception as e:
+            print(f"Relation stream failed: {type(e).__name__}: {e}")
+            yield f"event: error\ndata: {json.dumps({'detail': f'{type(e).__name__}: {e}'})}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@router.post("/relation_graphs/")
+async def create_relation_graph():
+    return relation_processor.create_graph()
+
+
+@router.get("/relation_graphs/{graph_id}")
+async def get_relation_graph(graph_id: str):
+    try:
+        return relation_processor.get_graph(graph_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown or expired graph_id")
+
+
+@router.delete("/relation_graphs/{graph_id}")
+async def delete_relation_graph(graph_id: str):
+    relation_processor.delete_graph(graph_id)
+    return {"graph_id": graph_id}
+
+
+@router.get("/relation_graphs/{graph_id}/svg")
+async def render_relation_graph(graph_id: str):
+    try:
+        return await relation_processor.render_graph(graph_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown or expired graph_id")
+
+
+@router.post("/relation_graphs/{graph_id}/extend")
+async def extend_relation_graph(graph_id: str, request: RelationGraphExtendRequest):
+    try:
+        return await relation_processor.extend_graph(graph_id, request.text, request.max_new_tokens)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown or expired graph_id")
+
+
+@router.post("/relation_graphs/{graph_id}/extend_stream")
+async def extend_relation_graph_stream(graph_id: str, request: RelationGraphExtendRequest):
+    # Check the graph exists before the stream starts, errors can't change the status code after that
+    try:
+        relation_processor.graph_store.relation_count(graph_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown or expired graph_id")
+
+    async def events():
+        try:
+            async for event, data in relation_processor.stream_extend_graph(
+                graph_id, request.text, request.max_new_tokens
+            ):
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        except KeyError:
+            # The graph expired or was evicted while its relations were being extracted
+            yield f"event: error\ndata: {json.dumps({'detail': 'Unknown or expired graph_id'})}\n\n"
+        except Exception as e:
+            print(f"Relation graph stream failed: {type(e).__name__}: {e}")
+            yield f"event: error\ndata: {json.dumps({'detail': f'{type(e).__name__}: {e}'})}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@router.get("/relation_graph_stats/")
+async def get_relation_graph_stats():
+    return relation_processor.graph_store.stats()
+
+
+@router.post("/get_document_relations/")
+async def get_document_relations(request: RelationDocumentRequest):
+    return await relation_processor.get_document_relation_graph(
+        request.text, request.max_new_tokens, request.concurrency, request.min_chunk_size, request.render_svg
+    )
+
+
+# Background jobs, submit returns a job_id straight away to poll or subscribe to instead of holding the request open
+@router.post("/relation_jobs/entity_relations/")
+async def submit_entity_relations_job(request: RelationRequest):
+    return await relation_jobs.submit("relation_graph", request.model_dump())
+
+
+@router.post("/relation_jobs/document_relations/")
+async def submit_document_relations_job(request: RelationDocumentRequest):
+    return await relation_jobs.submit("document_relations", request.model_dump())
+
+
+@router.get("/relation_jobs/{job_id}")
+async def get_relation_job(job_id: str):
+    try:
+        return await relation_jobs.status(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown job_id")
+
+
+@router.get("/relation_jobs/{job_id}/result")
+async def get_relation_job_result(job_id: str):
+    try:
+        status = await relation_jobs.status(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown job_id")
+    if status["status"] != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job is {status['status']}")
+    return await relation_jobs.result(job_id)
+
+
+@router.get("/relation_jobs/{job_id}/events")
+async def subscribe_relation_job(job_id: str):
+    try:
+        await relation_jobs.status(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown job_id")
+
+    # Server-sent events, a status event whenever the job's status or progress changes until it finishes
+    async def events():
+        while True:
+            status = await relation_jobs.status(job_id)
+            yield f"event: status\ndata: {json.dumps(status)}\n\n"
+            if status["status"] in FINISHED_STATUSES:
+                return
+            await relation_jobs.wait_for_change(job_id, timeout=15)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@router.delete("/relation_jobs/{job_id}")
+async def cancel_relation_job(job_id: str):
+    try:
+        return await relation_jobs.cancel(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown job_id")
+
+
+@router.get("/relation_job_stats/")
+async def get_relation_job_stats():
+    return await relation_jobs.stats()
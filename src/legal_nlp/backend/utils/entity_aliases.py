@@ -0,0 +1,195 @@
+import re
+from collections import defaultdict
+from fuzzywuzzy import fuzz
+
+TAG_PATTERN = re.compile(r"<[^<>]*>")
+WORD_PATTERN = re.compile(r"\w+")
+
+# Only names of people and organisations have aliases. Dates, amounts, statutes, provisions, courts and the like
+# that look alike ("section 5" and "section 51", "Court" and "Federal Court of Australia") are different entities.
+ALIAS_LABELS = {
+    "PERSON",
+    "OTHER_PERSON",
+    "PETITIONER",
+    "RESPONDENT",
+    "WITNESS",
+    "JUDGE",
+    "LAWYER",
+    "ORG",
+    "ORGANIZATION",
+    "ORGANISATION",
+    "COMPANY",
+}
+# Dropped when comparing names so "Mr. Doe" and "Doe" are the same key
+TITLES = {"mr", "mrs", "ms", "miss", "dr", "prof", "sir", "hon", "honourable", "justice", "judge"}
+# Too common to find candidates with, matching everything with "the" would make lookups scan the whole index
+STOP_WORDS = {"the", "of", "and", "for", "in", "a", "an", "pty", "ltd", "limited", "inc", "co", "company", "corp"}
+# Don't identify an organisation on their own, a bare "Court" is not an alias of "Federal Court of Australia"
+GENERIC_WORDS = {
+    "court", "tribunal", "commission", "department", "council", "government", "authority", "board", "office",
+    "bank", "group", "holdings", "trust", "association", "university", "act", "section",
+}
+
+
+def alias_key(name: str):
+    words = WORD_PATTERN.findall(TAG_PATTERN.sub("", name).casefold())
+    return " ".join(word for word in words if word not in TITLES)
+
+
+def significant_words(key: str):
+    return frozenset(word for word in key.split() if word not in STOP_WORDS and word not in GENERIC_WORDS)
+
+
+def digit_words(key: str):
+    return frozenset(word for word in key.split() if any(char.isdigit() for char in word))
+
+
+class EntityAliasIndex:
+    """
+    Resolves the different names a person or organisation is given across chunks ("John Doe", "Mr Doe", "DOE") to
+    one canonical name, the longest one seen. Names are only compared with names of the same label, on a normalised
+    key, against candidates sharing a word with them found through an inverted word index so lookups stay fast with
+    thousands of entities.
+
+    A name is an alias of an entity when its words are a subset or superset of every name the entity already has,
+    otherwise fuzzy token similarity catches misspellings. Names with different numbers in them never match. A name
+    that matches several entities equally well is left as its own entity, so "Smith" does not join "John Smith" and
+    "Jane Smith" together.
+
+    The canonical name of an entity changes when a longer alias is seen. Old names are collected by label until
+    take_renames() is called, so relations canonicalised earlier can be updated with rename_entities().
+    """
+
+    def __init__(self, threshold: int = 90):
+        self.threshold = threshold
+        self.canonical_names = []
+        self.canonical_keys = []
+        self.entity_labels = []
+        self.entity_digits = []
+        self.entity_members = []
+        self.entity_ids = {}
+        self.word_index = defaultdict(set)
+        self.resolved = {}
+        self.renamed = defaultdict(dict)
+
+    def __len__(self):
+        return len(self.canonical_names)
+
+    def resolve(self, name: str, label: str) -> str:
+        display_name = " ".join(TAG_PATTERN.sub("", name).split())
+        label = label.strip().upper() if isinstance(label, str) else ""
+        if label not in ALIAS_LABELS:
+            return display_name
+
+        entity_id = self.resolved.get((label, display_name))
+        if entity_id is None:
+            entity_id = self._resolve_id(display_name, label)
+            if entity_id is None:
+                return display_name
+            self.resolved[(label, display_name)] = entity_id
+        return self.canonical_names[entity_id]
+
+    def canonicalize_relations(self, relations):
+        """
+        Copy of relations with both entity names replaced by their canonical names. Every name in the batch is
+        resolved before any is replaced, so the whole batch uses the longest alias it contains.
+        """
+        relations = list(relations)
+        for item in relations:
+            for entity_key in ("entity1", "entity2"):
+                self.resolve(item[entity_key]["entity"], item[entity_key].get("type"))
+
+        return [
+            {
+                **item,
+                "entity1": {**item["entity1"], "entity": self.resolve(item["entity1"]["entity"], item["entity1"].get("type"))},
+                "entity2": {**item["entity2"], "entity": self.resolve(item["entity2"]["entity"], item["entity2"].get("type"))},
+            }
+            for item in relations
+        ]
+
+    def take_renames(self) -> dict:
+        """
+        Canonical names replaced by a longer alias since the last call, as {label: {old name: new name}}
+        """
+        renamed, self.renamed = self.renamed, defaultdict(dict)
+        return dict(renamed)
+
+    def _resolve_id(self, display_name, label):
+        key = alias_key(display_name)
+        words = significant_words(key)
+        if not words:
+            return None
+
+        entity_id = self.entity_ids.get((label, key))
+        if entity_id is None:
+            entity_id = self._match(label, key, words)
+            if entity_id is None:
+                entity_id = self._add(label, key, display_name)
+            self.entity_ids[(label, key)] = entity_id
+            self.entity_members[entity_id].append(words)
+            for word in words:
+                self.word_index[(label, word)].add(entity_id)
+
+        if len(display_name) > len(self.canonical_names[entity_id]):
+            self._rename(entity_id, key, display_name)
+        return entity_id
+
+    def _match(self, label, key, words):
+        digits = digit_words(key)
+        candidates = set()
+        for word in words:
+            candidates.update(self.word_index.get((label, word), ()))
+
+        best_score = 0
+        best_ids = []
+        for candidate in candidates:
+            if self.entity_digits[candidate] != digits:
+                continue
+            if all(words <= member or member <= words for member in self.entity_members[candidate]):
+                # Token set similarity of a subset is always 100, no need to compute it
+                score = 100
+            else:
+                score = fuzz.token_sort_ratio(key, self.canonical_keys[candidate])
+            if score > best_score:
+                best_score = score
+                best_ids = [candidate]
+            elif score == best_score:
+                best_ids.append(candidate)
+
+        if best_score < self.threshold or len(best_ids) != 1:
+            return None
+        return best_ids[0]
+
+    def _add(self, label, key, display_name):
+        entity_id = len(self.canonical_names)
+        self.canonical_names.append(display_name)
+        self.canonical_keys.append(key)
+        self.entity_labels.append(label)
+        self.entity_digits.append(digit_words(key))
+        self.entity_members.append([])
+        return entity_id
+
+    def _rename(self, entity_id, key, display_name):
+        old_name = self.canonical_names[entity_id]
+        self.canonical_names[entity_id] = display_name
+        self.canonical_keys[entity_id] = key
+        renamed = self.renamed[self.entity_labels[entity_id]]
+        for name, new_name in renamed.items():
+            if new_name == old_name:
+                renamed[name] = display_name
+        renamed[old_name] = display_name
+
+
+def rename_entities(relations, renamed: dict):
+    """
+    Copy of relations with entity names replaced as given by EntityAliasIndex.take_renames()
+    """
+
+    def rename(entity):
+        label = entity.get("type")
+        names = renamed.get(label.strip().upper() if isinstance(label, str) else "", {})
+        name = " ".join(TAG_PATTERN.sub("", entity["entity"]).split())
+        return {**entity, "entity": names[name]} if name in names else entity
+
+    return [{**item, "entity1": rename(item["entity1"]), "entity2": rename(item["entity2"])} for item in relations]
@@ -0,0 +1,128 @@
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from utils.entity_aliases import EntityAliasIndex, rename_entities
+from utils.relation_set import RelationSet
+
+
+def relation_size(relation):
+    return len(json.dumps(relation, ensure_ascii=False).encode("utf-8"))
+
+
+class GraphSession:
+    __slots__ = ("relations", "aliases", "size", "accessed")
+
+    def __init__(self):
+        self.relations = RelationSet()
+        self.aliases = EntityAliasIndex()
+        self.size = 0
+        self.accessed = time.monotonic()
+
+
+class GraphStore:
+    """
+    Relation graphs being built up chunk by chunk, kept server side under a graph id so clients only send each new
+    chunk and receive the relations it added. Graphs unused for ttl_seconds are dropped, and the least recently used
+    graphs are dropped when the relations held exceed max_bytes.
+    """
+
+    def __init__(self, ttl_seconds: float, max_bytes: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.sessions = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.evicted = 0
+
+    def create(self) -> str:
+        graph_id = uuid.uuid4().hex
+        with self.lock:
+            self._evict_expired()
+            self.sessions[graph_id] = GraphSession()
+        return graph_id
+
+    def get(self, graph_id: str) -> list[dict]:
+        """
+        Relations in the graph, raises KeyError if the graph doesn't exist or has expired
+        """
+        with self.lock:
+            return self._touch(graph_id).relations.to_list()
+
+    def relation_count(self, graph_id: str) -> int:
+        with self.lock:
+            return len(self._touch(graph_id).relations)
+
+    def add_relations(self, graph_id: str, relations):
+        """
+        Resolve entity aliases in relations with the graph's alias index and merge them into the graph. Returns the
+        relations added, the number dropped as duplicates and the entities renamed by a longer alias, as returned by
+        EntityAliasIndex.take_renames(). Relations already in the graph are renamed too.
+        """
+        with self.lock:
+            session = self._touch(graph_id)
+            relations = session.aliases.canonicalize_relations(relations)
+            renamed = session.aliases.take_renames()
+            if renamed:
+                self._rename(session, renamed)
+            added, removed = session.relations.merge(relations)
+            for relation in added:
+                size = relation_size(relation)
+                session.size += size
+                self.total_bytes += size
+            self._evict_over_capacity(keep=graph_id)
+            return added, removed, renamed
+
+    def delete(self, graph_id: str):
+        with self.lock:
+            session = self.sessions.pop(graph_id, None)
+            if session is not None:
+                self.total_bytes -= session.size
+
+    def stats(self):
+        with self.lock:
+            self._evict_expired()
+            return {
+                "graphs": len(self.sessions),
+                "relations": sum(len(session.relations) for session in self.sessions.values()),
+                "bytes": self.total_bytes,
+                "evicted": self.evicted,
+            }
+
+    def _rename(self, session, renamed):
+        session.relations = RelationSet(rename_entities(session.relations.to_list(), renamed))
+        size = sum(relation_size(relation) for relation in session.relations)
+        self.total_bytes += size - session.size
+        session.size = size
+
+    def _touch(self, graph_id):
+        self._evict_expired()
+        session = self.sessions.get(graph_id)
+        if session is None:
+            raise KeyError(graph_id)
+        session.accessed = time.monotonic()
+        self.sessions.move_to_end(graph_id)
+        return session
+
+    def _evict_expired(self):
+        # Sessions are ordered by last access so expired ones are always at the front
+        expiry = time.monotonic() - self.ttl_seconds
+        while self.sessions:
+            graph_id, session = next(iter(self.sessions.items()))
+            if session.accessed > expiry:
+                break
+            self._pop(graph_id)
+
+    def _evict_over_capacity(self, keep):
+        while self.total_bytes > self.max_bytes and len(self.sessions) > 1:
+            graph_id = next(iter(self.sessions))
+            if graph_id == keep:
+                break
+            self._pop(graph_id)
+
+    def _pop(self, graph_id):
+        session = self.sessions.pop(graph_id)
+        self.total_bytes -= session.size
+        self.evicted += 1
@@ -0,0 +1,243 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+
+
+class Job:
+    __slots__ = ("job_id", "kind", "params", "status", "done", "total", "error", "task", "cancel_requested", "changed")
+
+    def __init__(self, job_id, kind, params, status="queued", done=0, total=None):
+        self.job_id = job_id
+        self.kind = kind
+        self.params = params
+        self.status = status
+        self.done = done
+        self.total = total
+        self.error = None
+        self.task = None
+        self.cancel_requested = False
+        self.changed = asyncio.Event()
+
+
+class JobQueue:
+    """
+    Background jobs run by a fixed number of asyncio workers so long running requests don't hold an HTTP request
+    open. handlers maps a job kind to an async function(params, progress) returning a JSON serialisable result,
+    which calls progress(done, total) as it goes. Jobs and their results are kept in a SQLite table, jobs that were
+    still queued or running when the backend stopped are queued again on start().
+
+    SQLite is only used from threads, so the event loop never waits on a disk read or commit. Progress of running
+    jobs is kept in memory and written with the job's result rather than committed on every update.
+    """
+
+    def __init__(self, handlers: dict, workers: int, db_path: str = None, ttl_seconds: float = 86400):
+        self.handlers = handlers
+        self.worker_count = workers
+        self.ttl_seconds = ttl_seconds
+        self.jobs = {}
+        self.queue = None
+        self.workers = []
+        self.lock = threading.Lock()
+
+        if db_path and os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db = sqlite3.connect(db_path or ":memory:", check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, kind TEXT, params TEXT, status TEXT, "
+            "done INTEGER, total INTEGER, result TEXT, error TEXT, created REAL, started REAL, finished REAL)"
+        )
+        self.db.commit()
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        rows = await asyncio.to_thread(self._requeue_unfinished)
+        for job_id, kind, params in rows:
+            job = Job(job_id, kind, json.loads(params))
+            self.jobs[job_id] = job
+            self.queue.put_nowait(job)
+
+        self.workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+
+    async def stop(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    async def submit(self, kind: str, params: dict) -> dict:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind {kind}")
+
+        job = Job(uuid.uuid4().hex, kind, params)
+        await asyncio.to_thread(self._insert, job)
+        self.jobs[job.job_id] = job
+        self.queue.put_nowait(job)
+        return await self.status(job.job_id)
+
+    async def status(self, job_id: str) -> dict:
+        """
+        Status and progress of a job, raises KeyError for unknown jobs
+        """
+        row = await asyncio.to_thread(
+            self._fetch_one,
+            "SELECT kind, status, done, total, error, created, started, finished FROM jobs WHERE job_id = ?",
+            job_id,
+        )
+        if row is None:
+            raise KeyError(job_id)
+
+        kind, status, done, total, error, created, started, finished = row
+        job = self.jobs.get(job_id)
+        if job is not None:
+            # Progress of unfinished jobs is only kept in memory
+            done, total = job.done, job.total
+        return {
+            "job_id": job_id,
+            "kind": kind,
+            "status": status,
+            "progress": {"done": done, "total": total},
+            "error": error,
+            "created": created,
+            "started": started,
+            "finished": finished,
+        }
+
+    async def result(self, job_id: str):
+        """
+        Result of a succeeded job, None if the job hasn't succeeded. Raises KeyError for unknown jobs.
+        """
+        row = await asyncio.to_thread(self._fetch_one, "SELECT result FROM jobs WHERE job_id = ?", job_id)
+        if row is None:
+            raise KeyError(job_id)
+        return await asyncio.to_thread(json.loads, row[0]) if row[0] is not None else None
+
+    async def cancel(self, job_id: str) -> dict:
+        job = self.jobs.get(job_id)
+        if job is not None:
+            job.cancel_requested = True
+            if job.task is not None:
+                job.task.cancel()
+            elif job.status == "queued":
+                # Still queued, the worker that picks it up will skip it
+                await self._finish(job, "cancelled")
+        return await self.status(job_id)
+
+    async def wait_for_change(self, job_id: str, timeout: float):
+        """
+        Wait until the job's status or progress changes, or timeout seconds pass
+        """
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        try:
+            await asyncio.wait_for(job.changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def stats(self):
+        counts = dict(await asyncio.to_thread(self._fetch_all, "SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+        return {"workers": self.worker_count, "queued": self.queue.qsize() if self.queue else 0, "jobs": counts}
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                if job.status == "queued":
+                    await self._run(job)
+            finally:
+                self.queue.task_done()
+
+    async def _run(self, job):
+        handler = self.handlers[job.kind]
+        job.status = "running"
+        await asyncio.to_thread(
+            self._execute, "UPDATE jobs SET status = ?, started = ? WHERE job_id = ?", job.status, time.time(), job.job_id
+        )
+        self._notify(job)
+        if job.cancel_requested:
+            # Cancelled while it was being started
+            await self._finish(job, "cancelled")
+            return
+
+        job.task = asyncio.create_task(handler(job.params, lambda done, total: self._progress(job, done, total)))
+        try:
+            result = await job.task
+        except asyncio.CancelledError:
+            if not job.cancel_requested:
+                # The worker itself is being stopped, leave the job to be queued again on the next start
+                raise
+            await self._finish(job, "cancelled")
+        except Exception as e:
+            await self._finish(job, "failed", error=f"{type(e).__name__}: {e}")
+        else:
+            await self._finish(job, "succeeded", result=result)
+
+    def _progress(self, job, done, total):
+        job.done = done
+        job.total = total
+        self._notify(job)
+
+    async def _finish(self, job, status, result=None, error=None):
+        job.status = status
+        job.error = error
+        await asyncio.to_thread(self._store_finished, job, result)
+        self.jobs.pop(job.job_id, None)
+        self._notify(job)
+
+    # The methods below use SQLite and are run in threads
+
+    def _requeue_unfinished(self):
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT job_id, kind, params FROM jobs WHERE status IN ('queued', 'running') ORDER BY created"
+            ).fetchall()
+            self.db.execute("UPDATE jobs SET status = 'queued', started = NULL WHERE status = 'running'")
+            self.db.commit()
+        return rows
+
+    def _insert(self, job):
+        now = time.time()
+        params = json.dumps(job.params)
+        with self.lock:
+            # Old finished jobs are cleared out whenever a new one is submitted
+            self.db.execute(
+                "DELETE FROM jobs WHERE finished IS NOT NULL AND finished < ?", (now - self.ttl_seconds,)
+            )
+            self.db.execute(
+                "INSERT INTO jobs (job_id, kind, params, status, done, created) VALUES (?, ?, ?, ?, 0, ?)",
+                (job.job_id, job.kind, params, job.status, now),
+            )
+            self.db.commit()
+
+    def _store_finished(self, job, result):
+        result = json.dumps(result) if result is not None else None
+        with self.lock:
+            self.db.execute(
+                "UPDATE jobs SET status = ?, done = ?, total = ?, result = ?, error = ?, finished = ? WHERE job_id = ?",
+                (job.status, job.done, job.total, result, job.error, time.time(), job.job_id),
+            )
+            self.db.commit()
+
+    def _execute(self, sql, *params):
+        with self.lock:
+            self.db.execute(sql, params)
+            self.db.commit()
+
+    def _fetch_one(self, sql, *params):
+        with self.lock:
+            return self.db.execute(sql, params).fetchone()
+
+    def _fetch_all(self, sql, *params):
+        with self.lock:
+            return self.db.execute(sql, params).fetchall()
+
+    def _notify(self, job):
+        # Wake anything waiting on the job and give the next waiters a fresh event
+        job.changed.set()
+        job.changed = asyncio.Event()
@@ -0,0 +1,14 @@
+from utils.result_cache import make_cache_key
+
+
+class LabelSet:
+    """
+    Canonical form of a list of NER labels: whitespace stripped, empty and duplicate labels dropped (keeping the
+    first occurrence, as GLiNER does), plus an order independent key used in cache keys.
+    """
+
+    __slots__ = ("labels", "key")
+
+    def __init__(self, labels):
+        self.labels = list(dict.fromkeys(label.strip() for label in labels if label.strip()))
+        self.key = make_cache_key("labels", sorted(self.labels))
@@ -0,0 +1,59 @@
+import threading
+import time
+import traceback
+
+
+class LazyModel:
+    """
+    Base for processors whose models are loaded on first use, or up front by warm_up() in a background thread,
+    rather than at import time. Subclasses implement load_model() and call ensure_loaded() before using the model.
+    """
+
+    def __init__(self):
+        self.load_state = "not_loaded"
+        self.load_error = None
+        self.load_seconds = None
+        self.load_lock = threading.Lock()
+
+    def load_model(self):
+        raise NotImplementedError
+
+    def is_ready(self):
+        return self.load_state == "ready"
+
+    def ensure_loaded(self):
+        if self.load_state == "ready":
+            return
+
+        with self.load_lock:
+            if self.load_state == "ready":
+                return
+
+            self.load_state = "loading"
+            start = time.perf_counter()
+            try:
+                self.load_model()
+            except Exception as e:
+                self.load_state = "failed"
+                self.load_error = f"{type(e).__name__}: {e}"
+                raise
+
+            self.load_seconds = time.perf_counter() - start
+            self.load_error = None
+            self.load_state = "ready"
+
+    def warm_up(self):
+        """
+        Load the model in a background thread so the server can start serving straight away
+        """
+
+        def load():
+            try:
+                self.ensure_loaded()
+            except Exception:
+                traceback.print_exc()
+
+        threading.Thread(target=load, name=f"warm-up-{type(self).__name__}", daemon=True).start()
+
+    def load_status(self):
+        return {"state": self.load_state, "load_seconds": self.load_seconds, "error": self.load_error}
@@ -0,0 +1,91 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from utils.metrics import Histogram
+
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128]
+QUEUE_WAIT_MS_BUCKETS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000]
+
+
+class MicroBatcher:
+    """
+    Coalesces jobs submitted from many threads into batches. Jobs are collected until max_batch_size are queued or
+    the oldest job has waited max_wait_ms, then the whole batch is passed to batch_fn, which must return one result
+    per job in the same order. Each caller gets back only its own results.
+
+    Up to max_concurrent_batches batches are run at once (e.g. one per worker process). While all of them are busy new
+    jobs keep queueing, so batches grow under load rather than queueing up as many small ones.
+    """
+
+    def __init__(self, batch_fn, max_batch_size: int, max_wait_ms: float, max_concurrent_batches: int = 1):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self.max_concurrent_batches = max(1, max_concurrent_batches)
+        self.jobs = queue.Queue()
+        self.batch_slots = threading.Semaphore(self.max_concurrent_batches)
+        self.executor = ThreadPoolExecutor(self.max_concurrent_batches, thread_name_prefix="micro-batch")
+
+        self.batch_size_histogram = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_histogram = Histogram(QUEUE_WAIT_MS_BUCKETS)
+
+        self.worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self.worker.start()
+
+    def submit(self, job) -> Future:
+        future = Future()
+        self.jobs.put((job, future, time.monotonic()))
+        return future
+
+    def map(self, jobs: list) -> list:
+        futures = [self.submit(job) for job in jobs]
+        return [future.result() for future in futures]
+
+    def _run(self):
+        while True:
+            self.batch_slots.acquire()
+            batch = [self.jobs.get()]
+            deadline = batch[0][2] + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    batch.append(self.jobs.get(timeout=timeout) if timeout > 0 else self.jobs.get_nowait())
+                except queue.Empty:
+                    break
+
+            self.executor.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch):
+        try:
+            self._process_batch(batch)
+        finally:
+            self.batch_slots.release()
+
+    def _process_batch(self, batch):
+        started = time.monotonic()
+        self.batch_size_histogram.observe(len(batch))
+        for _, _, enqueued in batch:
+            self.queue_wait_histogram.observe((started - enqueued) * 1000)
+
+        try:
+            results = self.batch_fn([job for job, _, _ in batch])
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "max_concurrent_batches": self.max_concurrent_batches,
+            "queued": self.jobs.qsize(),
+            "batch_size": self.batch_size_histogram.snapshot(),
+            "queue_wait_ms": self.queue_wait_histogram.snapshot(),
+        }
@@ -0,0 +1,175 @@
+# The backend and the frontend each ship a copy of this module, tests/test_relation_json.py fails if they differ
+import json
+import re
+
+# Characters that change the scanner's state, everything else is skipped over by the regex engine
+STRUCTURAL_CHARS = re.compile(r'[{}\[\]"]')
+STRING_CHARS = re.compile(r'["\\]')
+# What is left after a decode error when text ends part way through a number, literal or escape ("4.", "nul", "\u00")
+PARTIAL_VALUE = re.compile(r"[\w.+\-\\]*")
+DECODER = json.JSONDecoder()
+
+
+class RelationStreamParser:
+    """
+    Pulls relation objects out of LLM output as it is generated. Each call to feed() scans only the new text and
+    returns the relation objects whose closing brace arrived in it, so the full response is never re-parsed.
+
+    Braces inside JSON strings are ignored and unfinished trailing output is held until more text arrives.
+    array_open should be True when the prompt already opened the JSON list (e.g. ends with " ["), so that
+    array_closed is set once the model closes it. array_closed_at is then the number of characters fed up to and
+    including the closing bracket. A "[" the model starts its output with anyway is taken as the same list.
+    """
+
+    def __init__(self, array_open: bool = False):
+        self.buffer = ""
+        # Characters fed before the start of buffer
+        self.offset = 0
+        self.position = 0
+        self.object_start = 0
+        self.depth = 0
+        self.in_string = False
+        self.array_depth = 1 if array_open else 0
+        # Before any object or bracket, an opening bracket repeats the one in the prompt
+        self.repeated_open = array_open
+        self.array_closed = False
+        self.array_closed_at = None
+        self.relations = []
+
+    def feed(self, text: str) -> list[dict]:
+        self.buffer += text
+        new_relations = []
+
+        buffer = self.buffer
+        position = self.position
+        while position < len(buffer):
+            if self.in_string:
+                match = STRING_CHARS.search(buffer, position)
+                if match is None:
+                    position = len(buffer)
+                    break
+                if match.group() == "\\":
+                    if match.end() >= len(buffer):
+                        # Wait for the escaped character before carrying on
+                        position = match.start()
+                        break
+                    position = match.end() + 1
+                    continue
+                self.in_string = False
+                position = match.end()
+                continue
+
+            match = STRUCTURAL_CHARS.search(buffer, position)
+            if match is None:
+                position = len(buffer)
+                break
+
+            char = match.group()
+            position = match.end()
+            if char == '"':
+                # Only strings inside objects are tracked, quotes in any surrounding prose are ignored
+                self.in_string = self.depth > 0
+            elif char == "{":
+                if self.depth == 0:
+                    self.repeated_open = False
+                    # Complete objects are parsed in one go by the C decoder, the scan above only walks objects
+                    # that are still being streamed in or aren't valid JSON
+                    try:
+                        parsed, end = DECODER.raw_decode(buffer, match.start())
+                    except json.JSONDecodeError as e:
+                        if is_truncated(e, buffer):
+                            # Scan it as it streams in, it's parsed (or dropped if broken) once it closes
+                            self.object_start = match.start()
+                            self.depth = 1
+                        # Otherwise it's a stray brace or broken object, skip it and carry on after it
+                    else:
+                        new_relations.extend(iter_relations(parsed))
+                        position = end
+                else:
+                    self.depth += 1
+            elif char == "}":
+                if self.depth > 0:
+                    self.depth -= 1
+                    if self.depth == 0:
+                        new_relations.extend(self._parse_object(buffer[self.object_start : position]))
+            elif self.depth == 0:
+                if char == "[" and self.repeated_open:
+                    self.repeated_open = False
+                elif char == "[":
+                    self.array_depth += 1
+                elif self.array_depth > 0:
+                    self.repeated_open = False
+                    self.array_depth -= 1
+                    if self.array_depth == 0 and not self.array_closed:
+                        self.array_closed = True
+                        self.array_closed_at = self.offset + position
+
+        # Only the unfinished object, if any, needs to be kept
+        if self.depth > 0:
+            self.buffer = buffer[self.object_start :]
+            self.offset += self.object_start
+            self.position = position - self.object_start
+            self.object_start = 0
+        else:
+            self.buffer = buffer[position:]
+            self.offset += position
+            self.position = 0
+
+        self.relations.extend(new_relations)
+        return new_relations
+
+    def _parse_object(self, object_text):
+        try:
+            parsed = json.loads(object_text)
+        except json.JSONDecodeError:
+            return []
+        return list(iter_relations(parsed))
+
+
+def is_truncated(error: json.JSONDecodeError, text: str):
+    """
+    Whether decoding failed because text ended part way through a value rather than because it isn't JSON. Text
+    cut inside a number or literal fails before its end ("Expecting value" at "nul", "Expecting ',' delimiter" at
+    "4."), so anything short of a partial value after the error position counts as broken.
+    """
+    if error.msg.startswith("Unterminated string"):
+        return True
+    return PARTIAL_VALUE.fullmatch(text[error.pos :].strip()) is not None
+
+
+def extract_relation_objects(text: str) -> list[dict]:
+    """
+    All complete relation objects in text, in a single linear pass. Unlike a regex over the relation fields this
+    handles braces inside descriptions and nested objects, and ignores truncated output at the end of the text.
+    """
+    return RelationStreamParser().feed(text)
+
+
+def iter_relations(value):
+    """
+    Yields relation dicts from parsed JSON, looking inside wrapper objects and lists the model sometimes adds
+    """
+    if isinstance(value, list):
+        for item in value:
+            yield from iter_relations(item)
+    elif isinstance(value, dict):
+        if is_relation(value):
+            additional_info = value.get("additional_info")
+            if not isinstance(additional_info, dict):
+                additional_info = {}
+            additional_info.setdefault("description", "")
+            value["additional_info"] = additional_info
+            yield value
+        else:
+            for item in value.values():
+                yield from iter_relations(item)
+
+
+def is_relation(value):
+    return (
+        isinstance(value.get("relation"), str)
+        and isinstance(value.get("entity1"), dict)
+        and isinstance(value.get("entity2"), dict)
+        and isinstance(value["entity1"].get("entity"), str)
+        and isinstance(value["entity2"].get("entity"), str)
+    )
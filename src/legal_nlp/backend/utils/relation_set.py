@@ -0,0 +1,57 @@
+from utils.entity_aliases import TAG_PATTERN
+
+
+def normalize_entity_name(entity: str):
+    name = " ".join(TAG_PATTERN.sub("", entity).split())
+    return name.strip(" .,;:'\"").casefold()
+
+
+def relation_key(relation):
+    """
+    Normalised (relation, entity, entity) triple. The graph is undirected so the entity pair is sorted, making a
+    relation and its reverse the same triple.
+    """
+    key1 = normalize_entity_name(relation["entity1"]["entity"])
+    key2 = normalize_entity_name(relation["entity2"]["entity"])
+    return (relation["relation"].strip().upper(), *sorted((key1, key2)))
+
+
+class RelationSet:
+    """
+    Deduplicated relations in insertion order, indexed by normalised triple.
+    Merging a batch costs time proportional to the batch, not to the relations already held.
+    """
+
+    def __init__(self, relations=()):
+        self.relations = {}
+        self.merge(relations)
+
+    def __len__(self):
+        return len(self.relations)
+
+    def __iter__(self):
+        return iter(self.relations.values())
+
+    def __contains__(self, relation):
+        return relation_key(relation) in self.relations
+
+    def to_list(self):
+        return list(self.relations.values())
+
+    def merge(self, relations):
+        """
+        Add a batch of relations. Returns the relations added and the number removed from the batch for repeating
+        a relation already held or relating an entity to itself.
+        """
+        added = []
+        removed = 0
+        for relation in relations:
+            key = relation_key(relation)
+            if key[1] == key[2] or key in self.relations:
+                removed += 1
+                continue
+
+            relation = {**relation, "relation": key[0]}
+            self.relations[key] = relation
+            added.append(relation)
+        return added, removed
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Rows read per query when trimming the disk tier back under max_disk_bytes
+EVICTION_BATCH_SIZE = 256
+
+
+def make_cache_key(*parts):
+    """
+    Content address for a set of JSON serialisable parts
+    """
+    serialized = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Cache of JSON serialisable results. Results are kept in an in-memory LRU bounded by bytes, with an optional
+    SQLite tier on disk (db_path) that survives restarts and is bounded by max_disk_bytes.
+    """
+
+    def __init__(self, max_bytes: int, db_path: str = None, max_disk_bytes: int = None):
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self.db = None
+        self.disk_bytes = 0
+        if db_path:
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, size INTEGER, accessed REAL)"
+            )
+            # Eviction takes the least recently accessed rows, without an index every eviction scans the table
+            self.db.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache(accessed)")
+            self.db.commit()
+            self.disk_bytes = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+
+    def get(self, key: str):
+        with self.lock:
+            serialized = self.memory.get(key)
+            if serialized is not None:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return json.loads(serialized)
+
+            if self.db is not None:
+                row = self.db.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self.db.execute("UPDATE cache SET accessed = ? WHERE key = ?", (time.time(), key))
+                    self.db.commit()
+                    self._set_memory(key, row[0])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return json.loads(row[0])
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value):
+        serialized = json.dumps(value, ensure_ascii=False)
+        with self.lock:
+            self._set_memory(key, serialized)
+            if self.db is not None:
+                self._set_disk(key, serialized)
+
+    def _set_memory(self, key, serialized):
+        size = len(serialized.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        if key in self.memory:
+            self.memory_bytes -= len(self.memory.pop(key).encode("utf-8"))
+        self.memory[key] = serialized
+        self.memory_bytes += size
+
+        # Evict least recently used results until back under the byte limit
+        while self.memory_bytes > self.max_bytes:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_bytes -= len(evicted.encode("utf-8"))
+
+    def _set_disk(self, key, serialized):
+        size = len(serialized.encode("utf-8"))
+        row = self.db.execute("SELECT size FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self.disk_bytes -= row[0]
+        self.db.execute(
+            "INSERT OR REPLACE INTO cache (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+            (key, serialized, size, time.time()),
+        )
+        self.disk_bytes += size
+
+        if self.max_disk_bytes is not None:
+            while self.disk_bytes > self.max_disk_bytes:
+                rows = self.db.execute(
+                    "SELECT key, size FROM cache ORDER BY accessed LIMIT ?", (EVICTION_BATCH_SIZE,)
+                ).fetchall()
+                if not rows:
+                    break
+                evicted = []
+                for evicted_key, evicted_size in rows:
+                    evicted.append((evicted_key,))
+                    self.disk_bytes -= evicted_size
+                    if self.disk_bytes <= self.max_disk_bytes:
+                        break
+                self.db.executemany("DELETE FROM cache WHERE key = ?", evicted)
+
+        self.db.commit()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self.memory),
+                "memory_bytes": self.memory_bytes,
+                "disk_bytes": self.disk_bytes if self.db is not None else None,
+            }
@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+import websockets
+
+
+class WebsocketPool:
+    """
+    Reuses websocket connections to one uri across requests. The inference server handles one stream per connection
+    at a time, so a connection is held by a single stream from acquire() to release() and up to max_connections
+    streams run at once, later ones wait for a connection to be released. Connections are pinged every
+    ping_interval seconds while open so proxies don't drop idle ones and dead ones are noticed, idle connections
+    are closed after idle_timeout seconds.
+    """
+
+    def __init__(
+        self,
+        uri: str,
+        max_connections: int,
+        max_idle: int,
+        ping_interval: float = 20,
+        ping_timeout: float = 20,
+        idle_timeout: float = 300,
+    ):
+        self.uri = uri
+        self.max_idle = max_idle
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.idle_timeout = idle_timeout
+        self.slots = None
+        self.max_connections = max_connections
+        # (websocket, time released), most recently released last
+        self.idle = []
+        self.opened = 0
+        self.reused = 0
+        self.discarded = 0
+
+    async def acquire(self, fresh: bool = False):
+        """
+        Returns (websocket, reused). An idle connection the server has closed can still look open until it's used,
+        so callers may retry on a fresh=True connection when a reused one fails before any response.
+        """
+        # Created on first use so it belongs to the running event loop
+        if self.slots is None:
+            self.slots = asyncio.Semaphore(self.max_connections)
+        await self.slots.acquire()
+        try:
+            expiry = time.monotonic() - self.idle_timeout
+            while self.idle and not fresh:
+                websocket, released = self.idle.pop()
+                if websocket.open and released > expiry:
+                    self.reused += 1
+                    return websocket, True
+                await self._discard(websocket)
+
+            websocket = await websockets.connect(
+                self.uri, ping_interval=self.ping_interval, ping_timeout=self.ping_timeout, max_size=None
+            )
+            self.opened += 1
+            return websocket, False
+        except BaseException:
+            self.slots.release()
+            raise
+
+    async def release(self, websocket, reusable: bool = True):
+        """
+        Return a connection to the pool. Pass reusable=False if the stream on it didn't run to the end, the server
+        may still send the rest of it so the connection is closed instead.
+        """
+        try:
+            if reusable and websocket.open and len(self.idle) < self.max_idle:
+                self.idle.append((websocket, time.monotonic()))
+            else:
+                await self._discard(websocket)
+        finally:
+            self.slots.release()
+
+    def stats(self):
+        return {
+            "max_connections": self.max_connections,
+            "idle": len(self.idle),
+            "opened": self.opened,
+            "reused": self.reused,
+            "discarded": self.discarded,
+        }
+
+    async def close(self):
+        idle, self.idle = self.idle, []
+        for websocket, _ in idle:
+            await self._discard(websocket)
+
+    async def _discard(self, websocket):
+        self.discarded += 1
+        try:
+            await asyncio.wait_for(websocket.close(), self.ping_timeout)
+        except Exception:
+            pass
@@ -0,0 +1,61 @@
+"""
+Fire concurrent /process_text/ requests with different label sets at a running backend and check that
+every returned entity label belongs to the label set of its own request.
+
+Run from src/legal_nlp with the backend already started: python -m benchmarks.ner_label_stress
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from backend.config import Config as BackendConfig
+
+SAMPLE_TEXT = (
+    "On 17 December 2020 John Smith, a director of OneSteel Pty Ltd, appeared before the Federal Court of Australia "
+    "in Sydney. He said the company paid $4.5 million under the Corporations Act 2001 for rail manufacturing technology "
+    "supplied by Carmichael Rail Network to Queensland Rail in Brisbane."
+)
+
+LABEL_SETS = [
+    ["person"],
+    ["organization"],
+    ["location", "date"],
+    ["law", "number"],
+    ["person", "organization", "location", "date", "law", "technology", "number"],
+]
+
+
+def send_request(base_url, labels):
+    response = requests.post(f"{base_url}/process_text/", json={"text": SAMPLE_TEXT, "labels": labels})
+    response.raise_for_status()
+    returned_labels = {label for _, label in response.json()["ner_tags"]}
+    return labels, returned_labels
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    base_url = f"http://{BackendConfig.HOST}:{BackendConfig.PORT}"
+    label_sets = [random.choice(LABEL_SETS) for _ in range(args.requests)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(lambda labels: send_request(base_url, labels), label_sets))
+    elapsed = time.perf_counter() - start
+
+    bleeds = [(labels, returned) for labels, returned in results if not returned.issubset(labels)]
+    for labels, returned in bleeds:
+        print(f"Label bleed: requested {labels}, got {sorted(returned)}")
+
+    print(f"{len(results)} requests, concurrency {args.concurrency}, {elapsed:.2f}s, {len(bleeds)} with label bleed")
+    if bleeds:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
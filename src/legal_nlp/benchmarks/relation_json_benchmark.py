@@ -0,0 +1,108 @@
+"""
+Compare the regex relation extractor that used to be in RelationProcessor.extract_json_from_text with the linear
+scanner in backend/utils/relation_json.py on large synthetic LLM responses.
+
+Reports the time to extract every relation from one response, how many relations each finds (the regex drops
+relations with a brace in their description), and the cost of re-extracting the accumulated response after every
+streamed delta against feeding the deltas to the incremental parser.
+
+Run from src/legal_nlp: python -m benchmarks.relation_json_benchmark
+"""
+import argparse
+import json
+import random
+import re
+import time
+
+from backend.utils.relation_json import RelationStreamParser, extract_relation_objects
+
+REGEX_PATTERN = r'{\s*"relation":\s*"[^"]+",\s*"entity1":\s*{[^}]+},\s*"entity2":\s*{[^}]+},\s*"additional_info":\s*{[^}]+}\s*}'
+
+ENTITIES = ["Carmichael", "OneSteel", "John Doe", "Federal Court of Australia", "Commonwealth", "Jane Smith"]
+RELATIONS = ["CONTRACTED_WITH", "SUED", "REPRESENTED_BY", "APPEARED_BEFORE", "EMPLOYED_BY"]
+
+
+def regex_extract(text):
+    matches = re.findall(REGEX_PATTERN, text, re.DOTALL)
+    return json.loads(f'[{",".join(matches)}]')
+
+
+def make_response(size_bytes, brace_fraction, seed=21):
+    """
+    A response of about size_bytes in the format the relation prompt asks for, some descriptions contain braces
+    """
+    rng = random.Random(seed)
+    relations = []
+    size = 0
+    while size < size_bytes:
+        description = f"{rng.choice(ENTITIES)} and {rng.choice(ENTITIES)} are related, see paragraph {rng.randint(1, 500)}."
+        if rng.random() < brace_fraction:
+            description += " The clause {3.1} applies."
+        relation = json.dumps(
+            {
+                "relation": rng.choice(RELATIONS),
+                "entity1": {"entity": rng.choice(ENTITIES), "type": "PERSON"},
+                "entity2": {"entity": rng.choice(ENTITIES), "type": "ORG"},
+                "additional_info": {"description": description},
+            },
+            indent=4,
+        )
+        relations.append(relation)
+        size += len(relation) + 2
+    return " " + ",\n".join(relations) + "\n]"
+
+
+def time_call(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def stream_regex(text, delta_size):
+    relations = []
+    for end in range(delta_size, len(text) + delta_size, delta_size):
+        relations = regex_extract(text[:end])
+    return relations
+
+
+def stream_parser(text, delta_size):
+    parser = RelationStreamParser(array_open=True)
+    for start in range(0, len(text), delta_size):
+        parser.feed(text[start : start + delta_size])
+    return parser.relations
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=float, default=1.0)
+    parser.add_argument("--brace-fraction", type=float, default=0.05)
+    parser.add_argument("--stream-kb", type=int, default=100, help="Size of the response streamed in deltas")
+    parser.add_argument("--delta-size", type=int, default=64, help="Characters per streamed delta")
+    args = parser.parse_args()
+
+    response = make_response(int(args.size_mb * 1024 * 1024), args.brace_fraction)
+    # Cut the last relation off part way through, as happens when the LLM runs out of tokens
+    truncated = response[: len(response) - 200]
+
+    print(f"Response of {len(response) / 1024 / 1024:.2f}MB")
+    for name, text in (("complete", response), ("truncated", truncated)):
+        regex_relations, regex_seconds = time_call(regex_extract, text)
+        scanner_relations, scanner_seconds = time_call(extract_relation_objects, text)
+        print(
+            f"  {name}: regex {regex_seconds * 1000:.1f}ms, {len(regex_relations)} relations | "
+            f"scanner {scanner_seconds * 1000:.1f}ms, {len(scanner_relations)} relations"
+        )
+
+    stream_text = make_response(args.stream_kb * 1024, args.brace_fraction)
+    deltas = -(-len(stream_text) // args.delta_size)
+    regex_relations, regex_seconds = time_call(stream_regex, stream_text, args.delta_size)
+    parser_relations, parser_seconds = time_call(stream_parser, stream_text, args.delta_size)
+    print(f"Streaming {args.stream_kb}KB in {deltas} deltas of {args.delta_size} characters")
+    print(
+        f"  regex over accumulated text {regex_seconds * 1000:.1f}ms, {len(regex_relations)} relations | "
+        f"incremental parser {parser_seconds * 1000:.1f}ms, {len(parser_relations)} relations"
+    )
+
+
+if __name__ == "__main__":
+    main()
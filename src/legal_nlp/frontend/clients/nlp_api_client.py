@@ -1,13 +1,59 @@
+import json
+import time
 import requests
 
 
+class RelationStreamError(Exception):
+    pass
+
+
+def iter_events(response, final_event):
+    """
+    Parse a server-sent events response into (event, data) pairs. Raises RelationStreamError when the backend sends
+    an error event or the stream ends before final_event, so partial results are never taken as the whole result.
+    """
+    event = None
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data = json.loads(line[len("data:"):])
+            if event == "error":
+                raise RelationStreamError(data["detail"])
+            yield event, data
+            if event == final_event:
+                return
+
+    raise RelationStreamError(f"Stream ended before the {final_event} event")
+
+
 class APIClient:
     def __init__(self, base_url):
         self.base_url = base_url
 
-    def process_text(self, text, labels):
+    def process_text(self, text, labels, include_tagged_text=False):
         endpoint = f"{self.base_url}/process_text"
-        data = {"text": str(text), "labels": labels}
+        data = {"text": str(text), "labels": labels, "include_tagged_text": include_tagged_text}
+        response = requests.post(endpoint, json=data)
+        response.raise_for_status()
+
+        return response.json()
+
+    def process_text_stream(self, text, labels, include_tagged_text=False):
+        """
+        Yields NER updates as the backend finishes each paragraph block of the text
+        """
+        endpoint = f"{self.base_url}/process_text_stream"
+        data = {"text": str(text), "labels": labels, "include_tagged_text": include_tagged_text}
+        with requests.post(endpoint, json=data, stream=True) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+
+    def process_text_batch(self, texts, labels, batch_size=None):
+        endpoint = f"{self.base_url}/process_text_batch"
+        data = {"texts": [str(text) for text in texts], "labels": labels, "batch_size": batch_size}
         response = requests.post(endpoint, json=data)
         response.raise_for_status()
 
@@ -22,7 +68,7 @@ class APIClient:
 
     def get_relation_graph(self, text):
         endpoint = f"{self.base_url}/get_entity_relations"
-        data = {"text": str(text)}
+        data = {"text": str(text), "render_svg": True}
         response = requests.post(endpoint, json=data)
         response.raise_for_status()
 
@@ -37,7 +83,7 @@ class APIClient:
         data = {
             "text": str(text),
             "existing_relations": str(existing_relations),
-            "max_new_tokens": 2048
+            "render_svg": True
         }
         response = requests.post(endpoint, json=data)
         response.raise_for_status()
@@ -47,3 +93,128 @@ class APIClient:
         relation_json = response_json["relation_json"]
 
         return graph_svg, relation_json
+
+    def stream_relation_graph(self, text, existing_relations, render_svg=False):
+        """
+        Yields ("relation", relation) for each relation as the LLM writes it, ("renamed", {label: {old name: new name}})
+        when entities in relations already yielded are renamed by a longer alias, then ("graph", {"graph_svg", "relation_json"})
+        """
+        endpoint = f"{self.base_url}/extend_entity_relations_stream"
+        data = {
+            "text": str(text),
+            "existing_relations": str(existing_relations),
+            "render_svg": render_svg
+        }
+        with requests.post(endpoint, json=data, stream=True) as response:
+            response.raise_for_status()
+            yield from iter_events(response, "graph")
+
+    def create_relation_graph(self):
+        """
+        Start a relation graph kept on the backend, returns its graph_id
+        """
+        endpoint = f"{self.base_url}/relation_graphs"
+        response = requests.post(endpoint)
+        response.raise_for_status()
+
+        return response.json()["graph_id"]
+
+    def delete_relation_graph(self, graph_id):
+        endpoint = f"{self.base_url}/relation_graphs/{graph_id}"
+        response = requests.delete(endpoint)
+        response.raise_for_status()
+
+    def render_relation_graph(self, graph_id):
+        """
+        Render the backend graph as svg
+        """
+        endpoint = f"{self.base_url}/relation_graphs/{graph_id}/svg"
+        response = requests.get(endpoint)
+        response.raise_for_status()
+
+        return response.json()["graph_svg"]
+
+    def get_relation_graph_relations(self, graph_id):
+        """
+        Every relation in the backend graph, None if the graph has expired
+        """
+        response = requests.get(f"{self.base_url}/relation_graphs/{graph_id}")
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+
+        return response.json()["relation_json"]
+
+    def extend_relation_graph(self, graph_id, text):
+        """
+        Extract relations from the next chunk of text into the backend graph, returns only the relations added and the
+        entities renamed by a longer alias, {label: {old name: new name}}
+        """
+        endpoint = f"{self.base_url}/relation_graphs/{graph_id}/extend"
+        data = {"text": str(text)}
+        response = requests.post(endpoint, json=data)
+        response.raise_for_status()
+
+        response_json = response.json()
+        return response_json["added_relations"], response_json["renamed"]
+
+    def stream_extend_relation_graph(self, graph_id, text):
+        """
+        Yields ("relation", relation) for each relation added to the backend graph as the LLM writes it, ("renamed", {label: {old name: new name}})
+        when entities are renamed by a longer alias, then ("done", {"graph_id", "relation_count"})
+        """
+        endpoint = f"{self.base_url}/relation_graphs/{graph_id}/extend_stream"
+        data = {"text": str(text)}
+        with requests.post(endpoint, json=data, stream=True) as response:
+            response.raise_for_status()
+            yield from iter_events(response, "done")
+
+    def get_document_relation_graph(self, text, concurrency=None, progress_callback=None, poll_interval=1.0):
+        """
+        Extract relations from every chunk of the tagged document concurrently on the backend and return the merged graph.
+        Runs as a background job on the backend, progress_callback(done, total) is called with the chunks done while it runs.
+        """
+        job = self.submit_document_relation_job(text, concurrency)
+        while job["status"] in ("queued", "running"):
+            if progress_callback is not None and job["progress"]["total"]:
+                progress_callback(job["progress"]["done"], job["progress"]["total"])
+            time.sleep(poll_interval)
+            job = self.get_relation_job(job["job_id"])
+
+        if job["status"] != "succeeded":
+            raise RuntimeError(f"Relation job {job['job_id']} {job['status']}: {job['error']}")
+
+        response_json = self.get_relation_job_result(job["job_id"])
+        graph_svg = response_json["graph_svg"]
+        relation_json = response_json["relation_json"]
+
+        return graph_svg, relation_json
+
+    def submit_document_relation_job(self, text, concurrency=None):
+        endpoint = f"{self.base_url}/relation_jobs/document_relations"
+        data = {"text": str(text), "concurrency": concurrency, "render_svg": True}
+        response = requests.post(endpoint, json=data)
+        response.raise_for_status()
+
+        return response.json()
+
+    def get_relation_job(self, job_id):
+        endpoint = f"{self.base_url}/relation_jobs/{job_id}"
+        response = requests.get(endpoint)
+        response.raise_for_status()
+
+        return response.json()
+
+    def get_relation_job_result(self, job_id):
+        endpoint = f"{self.base_url}/relation_jobs/{job_id}/result"
+        response = requests.get(endpoint)
+        response.raise_for_status()
+
+        return response.json()
+
+    def cancel_relation_job(self, job_id):
+        endpoint = f"{self.base_url}/relation_jobs/{job_id}"
+        response = requests.delete(endpoint)
+        response.raise_for_status()
+
+        return response.json()
@@ -1,28 +1,65 @@
+import json
+import random
 import requests
 import time
 from config import Config
 
+RUNNING_STATUSES = ("IN_QUEUE", "IN_PROGRESS")
+
+
+class PollBackoff:
+    """
+    Delay between polls of a Runpod job. Grows by factor after every poll that finds nothing new, up to max_delay,
+    and is jittered so concurrent jobs don't poll in lockstep. reset() drops back to min_delay once there is output.
+    """
+
+    def __init__(self, min_delay: float, max_delay: float, factor: float = 1.5, jitter: float = 0.2):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.factor = factor
+        self.jitter = jitter
+        self.delay = min_delay
+
+    def reset(self):
+        self.delay = self.min_delay
+
+    def next(self):
+        delay = self.delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+        self.delay = min(max(self.delay, 0.05) * self.factor, self.max_delay)
+        return delay
+
+
+def stream_delta(stream_json):
+    # /stream only returns the output produced since the previous call, along with the job status
+    return "".join(x["output"] for x in stream_json.get("stream", []))
+
+
+class RunpodJobError(Exception):
+    pass
+
+
 class RunpodClient:
     def __init__(self):
         self.base_uri = Config.RUNPOD_BASE_URI
         self.bearer_token = Config.RUNPOD_BEARER_TOKEN
-        self.status_check_delay = Config.RUNPOD_STATUS_CHECK_DELAY
-        self.stream_delay = Config.RUNPOD_STREAM_DELAY
-
-    def get_stream_output(self, stream_endpoint, headers):
-        stream_response = requests.get(stream_endpoint, headers=headers)
-        stream_json = stream_response.json()
-        output = [x["output"] for x in stream_json["stream"]]
-        return output
-
-    def queue_async_job(self, messages, stream=False,  generation_args={}):
-        endpoint = f"{self.base_uri}/run"
-        
-        headers = {
+        self.status_check_delay = float(Config.RUNPOD_STATUS_CHECK_DELAY)
+        self.stream_delay = float(Config.RUNPOD_STREAM_DELAY)
+        self.max_poll_delay = float(Config.RUNPOD_MAX_POLL_DELAY)
+        # Reuse connections between the job submission and status polls
+        self.session = requests.Session()
+        self.session.headers.update({
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.bearer_token}",
-        }
+        })
 
+    def request(self, method, url, job_stats, **kwargs):
+        response = self.session.request(method, url, **kwargs)
+        response.raise_for_status()
+        job_stats["requests"] += 1
+        job_stats["bytes"] += len(response.request.body or b"") + len(response.content)
+        return response.json()
+
+    def queue_async_job(self, messages, stream=False,  generation_args={}):
         data = {
             "input": {
                 "messages": messages,
@@ -36,33 +73,38 @@ class RunpodClient:
                 "use_lora": generation_args.get('use_lora', False),
             }
         }
+        job_stats = {"requests": 0, "bytes": 0}
 
-        # Queue up job
-        response = requests.post(endpoint, headers=headers, json=data, verify=True)
-        response.raise_for_status()
-        
-        jobId = response.json()['id']
+        # Queue up job, short prompts go to /runsync which usually returns the finished job straight away
+        if not stream and len(json.dumps(messages)) <= Config.RUNPOD_RUNSYNC_MAX_PROMPT_CHARS:
+            status = self.request("POST", f"{self.base_uri}/runsync", job_stats, json=data)
+        else:
+            status = self.request("POST", f"{self.base_uri}/run", job_stats, json=data)
+
+        jobId = status['id']
         status_endpoint = f"{self.base_uri}/status/{jobId}"
         stream_endpoint = f"{self.base_uri}/stream/{jobId}"
-        
-        status = {'id': jobId, 'status': "IN_QUEUE"}
-        
-        # Wait for job to finish
-        while (status['status'] == "IN_QUEUE" or status['status'] == "IN_PROGRESS"):
-            # Query job status
-            status_response = requests.get(status_endpoint, headers=headers)
-            status_response.raise_for_status()
-            status = status_response.json()
-            
-            if stream:
-                output = self.get_stream_output(stream_endpoint, headers)
-                yield "".join(output)
-                time.sleep(self.stream_delay)
-            else:
-                time.sleep(self.status_check_delay)
 
+        # Wait for job to finish
         if stream:
-            output = self.get_stream_output(stream_endpoint, headers)
-            yield "".join(output)
+            backoff = PollBackoff(max(self.stream_delay, self.status_check_delay), self.max_poll_delay)
+            while True:
+                status = self.request("GET", stream_endpoint, job_stats)
+                delta = stream_delta(status)
+                if delta:
+                    backoff.reset()
+                    yield delta
+                if status.get("status") not in RUNNING_STATUSES:
+                    break
+                time.sleep(backoff.next())
         else:
+            backoff = PollBackoff(self.status_check_delay, self.max_poll_delay)
+            while status['status'] in RUNNING_STATUSES:
+                time.sleep(backoff.next())
+                status = self.request("GET", status_endpoint, job_stats)
+
+        print(f"Runpod job {jobId} {status.get('status')}: {job_stats['requests']} requests, {job_stats['bytes']} bytes")
+        if status.get("status") != "COMPLETED":
+            raise RunpodJobError(f"Runpod job {jobId} {status.get('status')}")
+        if not stream:
             yield status['output']['response']
@@ -1,7 +1,8 @@
 import json
-import re
 import streamlit_agraph as agraph
 import streamlit as st
+from clients.nlp_api_client import RelationStreamError
+from utils.relation_json import extract_relation_objects
 
 MAX_ITERS_PER_CHUNK = 5
 
@@ -11,12 +12,19 @@ def strip_angle_brackets(entity):
 
 
 def extract_relation_json_from_text(text):
-    # Define a regular expression pattern to match each dictionary
-    pattern = r'{\s*"relation":\s*"[^"]+",\s*"entity1":\s*{[^}]+},\s*"entity2":\s*{[^}]+},\s*"additional_info":\s*{[^}]+}\s*}'
+    return extract_relation_objects(text)
 
-    # Find all matches of the pattern in the text
-    matches = re.findall(pattern, text, re.DOTALL)
-    return json.loads(f'[{",".join(matches)}]')
+
+def rename_entities(relations, renamed):
+    """
+    Apply the entity renames sent by the backend, {label: {old name: new name}}, to relations already received
+    """
+    def rename(entity):
+        names = renamed.get(str(entity.get("type", "")).strip().upper(), {})
+        name = " ".join(strip_angle_brackets(entity["entity"]).split())
+        return {**entity, "entity": names[name]} if name in names else entity
+
+    return [{**item, "entity1": rename(item["entity1"]), "entity2": rename(item["entity2"])} for item in relations]
 
 
 def chunk_text(text, min_chunk_size=2000):
@@ -39,7 +47,35 @@ def chunk_text(text, min_chunk_size=2000):
     return chunks
 
 
-def get_relation_graph(api_client, interactive=True):
+def stream_relation_graph(api_client, graph_id, text, live_placeholder):
+    """
+    Extract relations for a chunk into the backend graph, listing each new relation in live_placeholder as soon as the backend sends it.
+    Returns the new relations and the renames to apply to the relations from earlier chunks, in order.
+    """
+    new_relations = []
+    renames = []
+    try:
+        for event, data in api_client.stream_extend_relation_graph(graph_id, text):
+            if event == "renamed":
+                new_relations = rename_entities(new_relations, data)
+                renames.append(data)
+            elif event == "relation":
+                new_relations.append(data)
+                lines = [
+                    f"- {strip_angle_brackets(r['entity1']['entity'])} **{r['relation']}** {strip_angle_brackets(r['entity2']['entity'])}"
+                    for r in new_relations
+                ]
+                live_placeholder.markdown(f"Found {len(new_relations)} new relations...\n" + "\n".join(lines))
+    except RelationStreamError as e:
+        # The chunk stays queued in the graph building cache, its partial relations are not added to the graph
+        live_placeholder.error(f"Relation extraction failed: {e}")
+        raise
+    live_placeholder.empty()
+
+    return new_relations, renames
+
+
+def get_relation_graph(api_client, interactive=True, live_placeholder=None):
     if 'ner_text_tagged' not in st.session_state or len(st.session_state['ner_text_tagged']) < 4:
         response = "Please return to the entity extraction page and upload a document first."
         return response, response
@@ -49,12 +85,35 @@ def get_relation_graph(api_client, interactive=True):
     graph_building_cache = st.session_state.get('graph_building_cache')
     if graph_building_cache is None:
         graph_building_cache = {
-            'current_relation_graph': "[]",
+            # The graph is kept on the backend so only new chunks and new relations are sent
+            'graph_id': api_client.create_relation_graph(),
+            'relation_json': [],
             'chunks': chunk_text(st.session_state['ner_text_tagged']),
             'chunk_iters': 0
         }
     
-    graph_svg, relation_json = api_client.build_up_relation_graph(graph_building_cache['chunks'][0], graph_building_cache['current_relation_graph']) 
+    chunk = graph_building_cache['chunks'][0]
+    try:
+        if live_placeholder is not None:
+            added_relations, renames = stream_relation_graph(api_client, graph_building_cache['graph_id'], chunk, live_placeholder)
+        else:
+            added_relations, renamed = api_client.extend_relation_graph(graph_building_cache['graph_id'], chunk)
+            renames = [renamed]
+    except RelationStreamError:
+        # Relations streamed before the failure are already in the backend graph and won't be sent again when the
+        # chunk is retried, so take the graph as the backend has it
+        relation_json = api_client.get_relation_graph_relations(graph_building_cache['graph_id'])
+        if relation_json is None:
+            # The backend graph has expired, start again from the first chunk next time
+            st.session_state.pop('graph_building_cache', None)
+        else:
+            graph_building_cache['relation_json'] = relation_json
+            st.session_state['graph_building_cache'] = graph_building_cache
+        raise
+    relation_json = graph_building_cache['relation_json']
+    for renamed in renames:
+        relation_json = rename_entities(relation_json, renamed)
+    relation_json = relation_json + added_relations
 
     # Give the GPT model the relations that it has extracted from the document in the chat log
     hidden_response = "\n<hidden_message_start>Only you can see this message keep it hidden from the user.\nHere are the relations between the entities that have been extracted using a specialized NLP relation extractor.\n" \
@@ -68,18 +127,20 @@ def get_relation_graph(api_client, interactive=True):
         # Add the relation json to the visible_messages
         visible_response += "\n" + json.dumps(relation_json, indent=4)
     else:
-        # Add the generated html graph to visible_messages
+        # Add the generated html graph to visible_messages, svgs are only rendered when they will be shown
+        graph_svg = api_client.render_relation_graph(graph_building_cache['graph_id'])
         html = f"""\n<div style="max-width: 100%; overflow-x: auto;">{graph_svg}</div>"""
         visible_response += html
     
     if len(graph_building_cache['chunks']) > 1:
         graph_building_cache['chunks'] = graph_building_cache['chunks'][1:]
         # Cache current partial graph and continue next call
-        graph_building_cache['current_relation_graph'] = json.dumps(relation_json, indent=4)
+        graph_building_cache['relation_json'] = relation_json
         
         # Update graph cache and continue next call
         st.session_state['graph_building_cache'] = graph_building_cache
     else:
+        api_client.delete_relation_graph(graph_building_cache['graph_id'])
         if 'graph_building_cache' in st.session_state:
             # Since all chunks have been processed assume finished and clear cache
             del st.session_state['graph_building_cache']
@@ -20,6 +20,10 @@ class Config:
     RUNPOD_STREAM_DELAY = os.getenv("RUNPOD_STREAM_DELAY", 0.0)
     RUNPOD_STATUS_CHECK_DELAY = os.getenv("RUNPOD_STATUS_CHECK_DELAY", 0.1)
     RUNPOD_SERVERLESS=True
+    # Runpod jobs are polled with exponential backoff from RUNPOD_STATUS_CHECK_DELAY up to RUNPOD_MAX_POLL_DELAY seconds
+    RUNPOD_MAX_POLL_DELAY = float(os.getenv("RUNPOD_MAX_POLL_DELAY", 2.0))
+    # Non-streamed prompts up to this many characters go to /runsync and usually finish without polling
+    RUNPOD_RUNSYNC_MAX_PROMPT_CHARS = int(os.getenv("RUNPOD_RUNSYNC_MAX_PROMPT_CHARS", 16000))
 
 class PageConfig:
     page_title = "SCOTi"
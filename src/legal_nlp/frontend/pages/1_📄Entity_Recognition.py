@@ -59,52 +59,54 @@ def saturate_lighten_color(hex_color, percentage):
     return saturated_hex
 
 
-def highlight_ner(text, ner_tags, label_colors):
-    highlighted_text = ""
+def highlight_ner(text, entities, label_colors, offset=0):
+    # Entity offsets come from the API, offset is the position of text within the document the offsets refer to
+    highlighted_parts = []
     current_index = 0
-    for entity, label in ner_tags:
-        start_index = text.find(entity, current_index)
-        end_index = start_index + len(entity)
+    for entity in entities:
+        start_index = entity["start_char"] - offset
+        end_index = entity["end_char"] - offset
+        label = entity["label"]
         label_color = label_colors.get(label, "yellow")
         label_tag_color = saturate_lighten_color(label_color, -20)
-        highlighted_text += text[current_index:start_index]
-        highlighted_text += f'<mark style="background-color: {label_color};">{entity} <span style="font-size:.75rem; line-height:1rem; font-weight:600; border-radius:0.25rem; background-color:{label_tag_color}; padding-left:0.25rem; padding-right:0.25rem">{label}</span></mark>'
+        highlighted_parts.append(text[current_index:start_index])
+        highlighted_parts.append(f'<mark style="background-color: {label_color};">{text[start_index:end_index]} <span style="font-size:.75rem; line-height:1rem; font-weight:600; border-radius:0.25rem; background-color:{label_tag_color}; padding-left:0.25rem; padding-right:0.25rem">{label}</span></mark>')
         current_index = end_index
-    highlighted_text += text[current_index:]
-    return highlighted_text
+    highlighted_parts.append(text[current_index:])
+    return "".join(highlighted_parts)
 
 
-def add_plaintext_tags(text, ner_tags):
-    tagged_text = ""
-    current_index = 0
-    for entity, label in ner_tags:
-        start_index = text.find(entity, current_index)
-        end_index = start_index + len(entity)
-        tagged_text += text[current_index:start_index]
-        tagged_text += f"<{label}>{entity}</{label}>"
-        current_index = end_index
-    tagged_text += text[current_index:]
-    return tagged_text
+def label_text_entities(text_input, placeholder=None):
+    label_colors = {}
+    highlighted_parts = []
+    tagged_parts = []
 
+    # Stream the NER results from the API so highlights can be rendered as each block of text is processed
+    for update in api_client.process_text_stream(text_input, labels_input, include_tagged_text=True):
+        entities = update["entities"]
+        text_block = text_input[update["start_char"] : update["end_char"]]
 
-def label_text_entities(text_input):
-    # Call the API client to process the text
-    response = api_client.process_text(text_input, labels_input)
-    ner_tags = response["ner_tags"]
+        # Assign colors from the color palette to each label in order of first appearance
+        for entity in entities:
+            label = entity["label"]
+            if label not in label_colors:
+                label_colors[label] = COLOR_PALETTE[
+                    len(label_colors) % len(COLOR_PALETTE)
+                ]  # Use modulus to cycle through the color palette
 
-    # Assign colors from the color palette to each label
-    unique_tags = set([sublist[1] for sublist in ner_tags])
-    label_colors = {}
-    for i, label in enumerate(unique_tags):
-        label_colors[label] = COLOR_PALETTE[
-            i % len(COLOR_PALETTE)
-        ]  # Use modulus to cycle through the color palette
+        # Highlight NER tags using dynamic labels and colors
+        highlighted_parts.append(highlight_ner(text_block, entities, label_colors, update["start_char"]))
+        tagged_parts.append(update["tagged_text"])
+
+        if placeholder is not None:
+            placeholder.markdown(to_display_text("".join(highlighted_parts)), unsafe_allow_html=True)
+
+    return "".join(highlighted_parts), "".join(tagged_parts)
 
-    # Highlight NER tags using dynamic labels and colors
-    highlighted_html = highlight_ner(text_input, ner_tags, label_colors)
-    tagged_plaintext = add_plaintext_tags(text_input, ner_tags)
 
-    return highlighted_html, tagged_plaintext
+def to_display_text(highlighted_html):
+    # Double up new lines to render in markdown, replace 2 space indents with html space tag
+    return highlighted_html.replace('\n', '\n\n').replace('  ','&nbsp;&nbsp;')
 
 
 def split_list_into_df(my_list, num_columns):
@@ -177,19 +179,20 @@ with c_1.expander("🞂 Input Text And Labels", expanded=not show_processed_text
 
 with c_2:
     if st.button("Process text",help="If you have upload all documents and/or entered all text, click here to process entity extraction."):
+        live_highlight = c_1.empty()
         try:
             with st.spinner("Extracting Legal Entities ..."):
                 st.session_state["ner_input"] = text_input
-                highlight_html, ner_text_tagged = label_text_entities(text_input)
+                highlight_html, ner_text_tagged = label_text_entities(text_input, live_highlight)
                 st.session_state["ner_highlight"] = highlight_html
                 st.session_state["ner_text_tagged"] = ner_text_tagged
         except Exception as e:
             st.error(f"Error processing text: {e}")
+        live_highlight.empty()
 
 
 # Render text with ner label highlights
-# Double up new lines to render in markdown, replace 2 space indents with html space tag
-display_text = st.session_state['ner_highlight'].replace('\n', '\n\n').replace('  ','&nbsp;&nbsp;')
+display_text = to_display_text(st.session_state['ner_highlight'])
 
 c_1, c_2 = st.columns((0.8, 0.2), gap="medium")
 with c_1.expander("🞂 Processed Text", expanded=show_processed_text):
@@ -189,8 +189,9 @@ for i, message in enumerate(st.session_state.messages_visible):
         # If last message and we have not finished rendering the graph then continue rendering, reloading the chat as we get new updates to the graph
         if i+1 == len(st.session_state.messages_visible) and st.session_state.get('graph_building_cache') is not None:
             st.button("Pause", on_click=stop_graph_generation)            
+            live_relations = st.empty()
             with st.spinner():
-                bot_visible_response, bot_hidden_response = get_relation_graph(api_client)
+                bot_visible_response, bot_hidden_response = get_relation_graph(api_client, live_placeholder=live_relations)
                 
             pop_last_message()
             add_visible_message_to_state("assistant", bot_visible_response)
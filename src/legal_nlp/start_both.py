@@ -1,7 +1,43 @@
 import subprocess
-from time import sleep
+import requests
+from time import perf_counter, sleep
 from backend.config import Config as BackendConfig
 
+READY_POLL_INTERVAL = 0.25
+
+
+def wait_for_backend(backend_process, timeout):
+    """
+    Poll the backend until /ready reports all models loaded, printing how long it took to start serving and to be
+    ready. Without warm-up nothing loads the models until the first request, so then only wait for /health.
+    """
+    host = "127.0.0.1" if BackendConfig.HOST == "0.0.0.0" else BackendConfig.HOST
+    base_url = f"http://{host}:{BackendConfig.PORT}"
+    ready_path = "/ready" if BackendConfig.WARM_UP_MODELS else "/health"
+    start = perf_counter()
+    serving_seconds = None
+
+    while perf_counter() - start < timeout:
+        if backend_process.poll() is not None:
+            print("Backend exited before it was ready")
+            return False
+        try:
+            response = requests.get(f"{base_url}{ready_path}", timeout=1)
+            if serving_seconds is None:
+                serving_seconds = perf_counter() - start
+                print(f"Backend serving requests after {serving_seconds:.2f}s")
+            if response.status_code == 200:
+                models = response.json().get("models", "models load on first use")
+                print(f"Backend ready after {perf_counter() - start:.2f}s: {models}")
+                return True
+        except requests.exceptions.RequestException:
+            pass
+        sleep(READY_POLL_INTERVAL)
+
+    print(f"Backend not ready after {timeout}s, starting frontend anyway")
+    return False
+
+
 def main():
     # Launch FastAPI backend
     backend_process = subprocess.Popen([
@@ -12,7 +48,7 @@ def main():
         "--reload"
     ], cwd="./backend")
 
-    sleep(20)
+    wait_for_backend(backend_process, BackendConfig.READY_TIMEOUT)
     
     # Launch Streamlit frontend
     frontend_process = subprocess.Popen(["streamlit", "run", "frontend/🏠Home.py"])
@@ -0,0 +1,9 @@
+import os
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "legal_nlp")
+BACKEND_DIR = os.path.join(SRC_DIR, "backend")
+FRONTEND_DIR = os.path.join(SRC_DIR, "frontend")
+
+# The backend is run from its own directory and imports its modules top level ("from utils.x import y")
+sys.path.insert(0, BACKEND_DIR)
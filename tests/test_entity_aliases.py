@@ -0,0 +1,74 @@
+from utils.entity_aliases import EntityAliasIndex, rename_entities
+
+
+def test_titles_and_partial_names_resolve_to_the_longest_name():
+    index = EntityAliasIndex()
+    assert index.resolve("Doe", "PERSON") == "Doe"
+    assert index.resolve("Mr. Doe", "PERSON") == "Mr. Doe"
+    assert index.resolve("John Doe", "PERSON") == "John Doe"
+    assert index.resolve("DOE", "PERSON") == "John Doe"
+    assert index.take_renames() == {"PERSON": {"Doe": "John Doe", "Mr. Doe": "John Doe"}}
+    assert index.take_renames() == {}
+
+
+def test_misspellings_match():
+    index = EntityAliasIndex()
+    index.resolve("Carmichael Rail Network", "ORG")
+    assert index.resolve("Carmicheal Rail Network", "ORG") == "Carmichael Rail Network"
+
+
+def test_ambiguous_names_are_not_merged():
+    index = EntityAliasIndex()
+    index.resolve("John Smith", "PERSON")
+    index.resolve("Jane Smith", "PERSON")
+    assert index.resolve("Smith", "PERSON") == "Smith"
+    assert len(index) == 3
+
+
+def test_names_with_different_numbers_are_not_merged():
+    index = EntityAliasIndex()
+    assert index.resolve("Holdings 1 Pty Ltd", "ORG") == "Holdings 1 Pty Ltd"
+    assert index.resolve("Holdings 2 Pty Ltd", "ORG") == "Holdings 2 Pty Ltd"
+
+
+def test_generic_words_do_not_make_an_alias():
+    index = EntityAliasIndex()
+    index.resolve("Federal Court of Australia", "ORG")
+    assert index.resolve("Court", "ORG") == "Court"
+    assert index.resolve("High Court of Australia", "ORG") == "High Court of Australia"
+
+
+def test_only_people_and_organisations_are_aliased():
+    index = EntityAliasIndex()
+    assert index.resolve("section 51", "PROVISION") == "section 51"
+    assert index.resolve("section 5", "PROVISION") == "section 5"
+    assert index.resolve("17 December 2020", "DATE") == "17 December 2020"
+    assert index.resolve("December 2020", "DATE") == "December 2020"
+    assert len(index) == 0
+
+
+def test_aliases_are_kept_per_label():
+    index = EntityAliasIndex()
+    index.resolve("Acme Corporation", "ORG")
+    assert index.resolve("Acme", "PERSON") == "Acme"
+    assert index.resolve("Acme", "ORG") == "Acme Corporation"
+
+
+def test_canonicalize_relations_uses_the_longest_name_in_the_batch():
+    index = EntityAliasIndex()
+    relations = [
+        {"relation": "SUED", "entity1": {"entity": "Doe", "type": "PERSON"}, "entity2": {"entity": "Acme", "type": "ORG"}},
+        {"relation": "PAID", "entity1": {"entity": "John Doe", "type": "PERSON"}, "entity2": {"entity": "Acme", "type": "ORG"}},
+    ]
+    canonical = index.canonicalize_relations(relations)
+    assert [relation["entity1"]["entity"] for relation in canonical] == ["John Doe", "John Doe"]
+    assert relations[0]["entity1"]["entity"] == "Doe"
+
+
+def test_rename_entities_applies_renames_by_label():
+    relations = [
+        {"relation": "SUED", "entity1": {"entity": "Doe", "type": "PERSON"}, "entity2": {"entity": "Doe", "type": "ORG"}},
+    ]
+    [renamed] = rename_entities(relations, {"PERSON": {"Doe": "John Doe"}})
+    assert renamed["entity1"]["entity"] == "John Doe"
+    assert renamed["entity2"]["entity"] == "Doe"
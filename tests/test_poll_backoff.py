@@ -0,0 +1,25 @@
+import random
+
+from clients.runpod_client import PollBackoff
+
+
+def test_delay_grows_to_max_and_resets():
+    random.seed(0)
+    backoff = PollBackoff(0.1, 1.0, factor=2, jitter=0)
+    assert [round(backoff.next(), 3) for _ in range(6)] == [0.1, 0.2, 0.4, 0.8, 1.0, 1.0]
+
+    backoff.reset()
+    assert backoff.next() == 0.1
+
+
+def test_delay_is_jittered_within_bounds():
+    random.seed(0)
+    delays = [PollBackoff(1.0, 10.0, jitter=0.2).next() for _ in range(50)]
+    assert all(0.8 <= delay <= 1.2 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_zero_min_delay_still_backs_off():
+    backoff = PollBackoff(0, 1.0, factor=2, jitter=0)
+    assert backoff.next() == 0
+    assert backoff.next() > 0
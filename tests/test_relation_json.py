@@ -0,0 +1,92 @@
+import os
+
+from conftest import BACKEND_DIR, FRONTEND_DIR
+from utils.relation_json import RelationStreamParser, extract_relation_objects
+
+
+def read_source(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def test_frontend_copy_matches_backend():
+    backend = read_source(os.path.join(BACKEND_DIR, "utils", "relation_json.py"))
+    frontend = read_source(os.path.join(FRONTEND_DIR, "utils", "relation_json.py"))
+    assert frontend == backend, "frontend/utils/relation_json.py differs from backend/utils/relation_json.py"
+
+
+RELATION = '{"relation": "SUED", "entity1": {"entity": "A", "type": "ORG"}, "entity2": {"entity": "B", "type": "ORG"}}'
+
+
+def test_parser_returns_relations_as_their_closing_brace_arrives():
+    parser = RelationStreamParser(array_open=True)
+    text = "\n  " + RELATION + ",\n  " + RELATION.replace("SUED", "PAID") + "\n]"
+    split = text.index("PAID")
+
+    first = parser.feed(text[:split])
+    second = parser.feed(text[split:])
+
+    assert [relation["relation"] for relation in first] == ["SUED"]
+    assert [relation["relation"] for relation in second] == ["PAID"]
+    assert parser.array_closed
+    assert parser.array_closed_at == len(text)
+
+
+def test_parser_output_does_not_depend_on_how_text_is_split():
+    text = "[" + RELATION + ", " + RELATION.replace("SUED", "PAID") + "]"
+    whole = RelationStreamParser().feed(text)
+
+    parser = RelationStreamParser()
+    pieces = [relation for char in text for relation in parser.feed(char)]
+    assert pieces == whole
+    assert len(whole) == 2
+
+
+def test_parser_ignores_braces_inside_strings():
+    relation = RELATION[:-1] + ', "additional_info": {"description": "a } and a \\" {"}}'
+    [parsed] = extract_relation_objects("[" + relation + "]")
+    assert parsed["additional_info"]["description"] == 'a } and a " {'
+
+
+def test_truncated_output_is_held_back():
+    parser = RelationStreamParser(array_open=True)
+    assert parser.feed(RELATION[:-10]) == []
+    assert not parser.array_closed
+    assert len(parser.feed(RELATION[-10:])) == 1
+
+
+def test_non_relation_objects_are_skipped_and_descriptions_filled_in():
+    [parsed] = extract_relation_objects('[{"note": "nothing here"}, ' + RELATION + "]")
+    assert parsed["relation"] == "SUED"
+    assert parsed["additional_info"] == {"description": ""}
+
+
+def test_relations_with_literals_and_numbers_survive_any_split():
+    relation = (
+        '{"relation": "PAID", "entity1": {"entity": "A", "type": null}, "entity2": {"entity": "B", "type": "ORG"}, '
+        '"additional_info": {"description": "paid \\u00e9", "confirmed": true, "disputed": false, "amount": 4.5, '
+        '"rate": -1.25e-3}}'
+    )
+    text = "[" + relation + "]"
+    [expected] = extract_relation_objects(text)
+
+    for split in range(1, len(text)):
+        parser = RelationStreamParser()
+        parsed = parser.feed(text[:split]) + parser.feed(text[split:])
+        assert parsed == [expected], f"lost the relation when split at {text[:split]!r}"
+
+
+def test_repeated_opening_bracket_is_the_prompt_list():
+    text = "```json\n[\n  " + RELATION + "\n]\n```\nDone."
+    parser = RelationStreamParser(array_open=True)
+    assert len(parser.feed(text)) == 1
+    assert parser.array_closed
+    assert parser.array_closed_at == text.index("]") + 1
+
+
+def test_nested_list_after_the_first_relation_still_counts():
+    parser = RelationStreamParser(array_open=True)
+    parser.feed(RELATION + ", [" + RELATION + "]")
+    assert not parser.array_closed
+    parser.feed("]")
+    assert parser.array_closed
@@ -0,0 +1,37 @@
+import pytest
+
+from config import Config
+from endpoints.relation_processor import relation_processor
+
+
+@pytest.fixture
+def budget_config(monkeypatch):
+    monkeypatch.setattr(Config, "RELATION_ADAPTIVE_MAX_TOKENS", True)
+    monkeypatch.setattr(Config, "RELATION_MIN_NEW_TOKENS", 100)
+    monkeypatch.setattr(Config, "RELATION_TOKENS_PER_RELATION", 50)
+    monkeypatch.setattr(Config, "RELATION_RELATIONS_PER_ENTITY", 3)
+
+
+def test_budget_grows_with_distinct_entities(budget_config):
+    text = "<PERSON>John Doe</PERSON> works for <ORG>Acme</ORG>, <ORG>acme</ORG> and <ORG>Globex</ORG>"
+    # Three distinct entities, three possible pairs
+    assert relation_processor.relation_token_budget(text, 4000) == 100 + 3 * 50
+
+
+def test_budget_uses_relations_per_entity_for_many_entities(budget_config):
+    text = " ".join(f"<PERSON>Person {i}</PERSON>" for i in range(10))
+    assert relation_processor.relation_token_budget(text, 4000) == 100 + 10 * 3 * 50
+
+
+def test_budget_is_capped_at_max_new_tokens(budget_config):
+    text = " ".join(f"<PERSON>Person {i}</PERSON>" for i in range(10))
+    assert relation_processor.relation_token_budget(text, 500) == 500
+
+
+def test_untagged_text_gets_the_full_budget(budget_config):
+    assert relation_processor.relation_token_budget("No tagged entities here.", 4000) == 4000
+
+
+def test_budget_can_be_disabled(budget_config, monkeypatch):
+    monkeypatch.setattr(Config, "RELATION_ADAPTIVE_MAX_TOKENS", False)
+    assert relation_processor.relation_token_budget("<ORG>Acme</ORG>", 4000) == 4000
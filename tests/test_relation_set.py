@@ -0,0 +1,39 @@
+from utils.relation_set import RelationSet, relation_key
+
+
+def make_relation(relation, entity1, entity2):
+    return {
+        "relation": relation,
+        "entity1": {"entity": entity1, "type": "PERSON"},
+        "entity2": {"entity": entity2, "type": "ORG"},
+        "additional_info": {"description": ""},
+    }
+
+
+def test_reversed_and_renormalised_relations_have_the_same_key():
+    assert relation_key(make_relation("employed_by ", "John Doe", "Acme")) == relation_key(
+        make_relation("EMPLOYED_BY", "acme.", "<PERSON>John  Doe</PERSON>")
+    )
+
+
+def test_merge_drops_duplicates_and_self_relations():
+    relations = RelationSet([make_relation("EMPLOYED_BY", "John Doe", "Acme")])
+    added, removed = relations.merge(
+        [
+            make_relation("employed_by", "Acme", "john doe"),
+            make_relation("SUED", "Acme", "ACME"),
+            make_relation("SUED", "John Doe", "Acme"),
+        ]
+    )
+
+    assert [relation["relation"] for relation in added] == ["SUED"]
+    assert removed == 2
+    assert len(relations) == 2
+    assert make_relation("SUED", "Acme", "John Doe") in relations
+
+
+def test_relations_keep_insertion_order():
+    relations = RelationSet()
+    relations.merge([make_relation("B", "x", "y"), make_relation("A", "x", "y")])
+    relations.merge([make_relation("C", "x", "y")])
+    assert [relation["relation"] for relation in relations.to_list()] == ["B", "A", "C"]
@@ -0,0 +1,68 @@
+from utils.result_cache import ResultCache, make_cache_key
+
+
+def test_cache_key_is_stable_and_order_independent():
+    assert make_cache_key("ner", {"a": 1, "b": 2}) == make_cache_key("ner", {"b": 2, "a": 1})
+    assert make_cache_key("ner", "text") != make_cache_key("ner_block", "text")
+
+
+def test_get_returns_copy_of_stored_value_and_counts_lookups():
+    cache = ResultCache(1024)
+    value = {"entities": [{"label": "PERSON"}]}
+    cache.set("key", value)
+    value["entities"].clear()
+
+    assert cache.get("key") == {"entities": [{"label": "PERSON"}]}
+    assert cache.get("missing") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_memory_is_bounded_by_bytes_least_recently_used_first():
+    cache = ResultCache(25)  # Values are stored serialised, each of these is 10 bytes
+    cache.set("a", "x" * 8)
+    cache.set("b", "y" * 8)
+    cache.get("a")
+    cache.set("c", "z" * 8)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "x" * 8
+    assert cache.get("c") == "z" * 8
+    assert cache.stats()["memory_bytes"] <= 25
+
+
+def test_values_larger_than_the_cache_are_not_kept():
+    cache = ResultCache(10)
+    cache.set("big", "x" * 100)
+    assert cache.get("big") is None
+    assert cache.stats()["memory_entries"] == 0
+
+
+def test_disk_tier_survives_restart_and_is_bounded(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite")
+    cache = ResultCache(1024, db_path, max_disk_bytes=25)
+    cache.set("a", "x" * 8)
+    cache.set("b", "y" * 8)
+    cache.set("c", "z" * 8)
+    cache.db.close()
+
+    reopened = ResultCache(1024, db_path, max_disk_bytes=25)
+    assert reopened.get("a") is None
+    assert reopened.get("c") == "z" * 8
+    assert reopened.stats()["disk_hits"] == 1
+    assert reopened.stats()["disk_bytes"] <= 25
+
+
+def test_disk_eviction_uses_the_accessed_index_and_trims_many_rows(tmp_path):
+    cache = ResultCache(1024, str(tmp_path / "cache.sqlite"), max_disk_bytes=1000)
+    plan = cache.db.execute("EXPLAIN QUERY PLAN SELECT key, size FROM cache ORDER BY accessed LIMIT 1").fetchall()
+    assert any("cache_accessed" in row[-1] for row in plan)
+
+    for i in range(600):
+        cache.set(f"small{i}", "x")
+    cache.set("big", "y" * 900)
+
+    rows, disk_bytes = cache.db.execute("SELECT COUNT(*), SUM(size) FROM cache").fetchone()
+    assert disk_bytes == cache.stats()["disk_bytes"] <= 1000
+    assert rows < 40
+    assert cache.db.execute("SELECT 1 FROM cache WHERE key = 'big'").fetchone() is not None
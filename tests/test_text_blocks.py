@@ -0,0 +1,48 @@
+from nlp.text_blocks import split_blocks
+
+
+def assert_covers(text, blocks):
+    assert "".join(block for _, block in blocks) == text
+    for offset, block in blocks:
+        assert text[offset : offset + len(block)] == block
+
+
+def test_paragraphs_are_blocks():
+    text = "First paragraph.\n\nSecond paragraph.\n  \nThird."
+    blocks = split_blocks(text, 2000)
+    assert [block for _, block in blocks] == ["First paragraph.\n\n", "Second paragraph.\n  \n", "Third."]
+    assert_covers(text, blocks)
+
+
+def test_single_line_paragraph_longer_than_the_limit_is_split_at_sentences():
+    sentences = [
+        f"Mr. Smith of Acme Pty. Ltd. paid invoice {i} under s. 51 of the Act on 17 June 2020. " for i in range(40)
+    ]
+    text = "".join(sentences).strip()
+    blocks = split_blocks(text, 500)
+
+    assert_covers(text, blocks)
+    assert all(len(block) <= 500 for _, block in blocks)
+    assert [block.strip() for _, block in blocks] == [sentence.strip() for sentence in sentences]
+
+
+def test_sentence_longer_than_the_limit_is_split_at_whitespace():
+    text = " ".join(f"word{i}" for i in range(300))
+    blocks = split_blocks(text, 100)
+
+    assert_covers(text, blocks)
+    assert all(len(block) <= 100 for _, block in blocks)
+    assert all(block.endswith(" ") for _, block in blocks[:-1])
+
+
+def test_text_without_whitespace_is_cut_at_the_limit():
+    text = "x" * 250
+    assert [len(block) for _, block in split_blocks(text, 100)] == [100, 100, 50]
+
+
+def test_edit_only_changes_the_edited_sentence_block():
+    text = " ".join(f"Sentence number {i} is about Acme." for i in range(60))
+    edited = text.replace("number 30 ", "number thirty ")
+    before = {block for _, block in split_blocks(text, 300)}
+    after = {block for _, block in split_blocks(edited, 300)}
+    assert len(after - before) == 1